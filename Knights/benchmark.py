@@ -0,0 +1,189 @@
+import random
+import sys
+import time
+import tracemalloc
+
+from logic import *
+from generate import random_puzzle, knight, knave
+import puzzle
+
+# Sizes of the generated knowledge bases, in symbols
+SIZES = [8, 12, 16, 20]
+
+# Numbers of characters in the generated puzzles
+CHARACTERS = [2, 4, 6, 8, 10, 12, 16, 20, 32, 64]
+
+# Nesting depth of generated statements
+DEPTH = 2
+
+# Most characters each backend is run on; beyond it a single puzzle
+# takes minutes, since enumeration is exponential in 2 * characters
+LIMITS = {
+    "enumerate": 12,
+    "parallel": 12,
+    "prune": 20,
+    "sat": 64,
+}
+
+# Clauses per symbol in generated knowledge bases, near the 3-SAT threshold
+CLAUSE_RATIO = 4
+
+
+def main():
+    mode = sys.argv[1] if len(sys.argv) > 1 else "nodes"
+    if mode not in ("nodes", "backends"):
+        sys.exit("Usage: python benchmark.py [nodes | backends] [size ...]")
+    try:
+        sizes = [int(size) for size in sys.argv[2:]]
+    except ValueError:
+        sys.exit("Usage: python benchmark.py [nodes | backends] [size ...]")
+
+    if mode == "nodes":
+        compare_nodes(sizes or SIZES)
+    else:
+        compare_backends(sizes or CHARACTERS)
+
+
+def compare_nodes(sizes):
+    """
+    Prints the nodes visited with and without pruning for the bundled
+    puzzles and for random knowledge bases of the given sizes.
+    """
+    puzzles = [
+        ("Puzzle 0", puzzle.knowledge0),
+        ("Puzzle 1", puzzle.knowledge1),
+        ("Puzzle 2", puzzle.knowledge2),
+        ("Puzzle 3", puzzle.knowledge3)
+    ]
+    symbols = [puzzle.AKnight, puzzle.AKnave, puzzle.BKnight,
+               puzzle.BKnave, puzzle.CKnight, puzzle.CKnave]
+    cases = [
+        (name, knowledge, symbol)
+        for name, knowledge in puzzles
+        for symbol in symbols
+    ]
+    rng = random.Random(0)
+    for n in sizes:
+        knowledge = random_knowledge(n, rng)
+        for symbol in sorted(knowledge.symbols())[:3]:
+            cases.append((f"Random {n}", knowledge, Symbol(symbol)))
+
+    print(f"{'knowledge':>12} {'query':>16} {'symbols':>7} "
+          f"{'tree nodes':>10} {'pruned':>10} {'ratio':>7} "
+          f"{'full (s)':>9} {'pruned (s)':>10}")
+    for name, knowledge, query in cases:
+        n = len(knowledge.symbols() | query.symbols())
+        full, pruned, full_time, pruned_time = compare(knowledge, query)
+        print(f"{name:>12} {str(query):>16} {n:>7} "
+              f"{full:>10} {pruned:>10} {pruned / full:>7.3f} "
+              f"{full_time:>9.4f} {pruned_time:>10.4f}")
+
+
+def random_knowledge(n, rng):
+    """
+    Returns a random knowledge base over `n` symbols, made of
+    CLAUSE_RATIO * n disjunctions of three literals each.
+    """
+    symbols = [Symbol(f"P{i}") for i in range(n)]
+    clauses = []
+    for _ in range(CLAUSE_RATIO * n):
+        clauses.append(Or(*[
+            symbol if rng.random() < 0.5 else Not(symbol)
+            for symbol in rng.sample(symbols, 3)
+        ]))
+    return And(*clauses)
+
+
+def compare(knowledge, query):
+    """
+    Checks entailment with and without pruning.
+    Returns the number of nodes in the full enumeration tree and the
+    number of partial models visited by prune_check, followed by the
+    time each backend took.
+    """
+    n = len(knowledge.symbols() | query.symbols())
+
+    # Enumerating every model visits each node of a full binary tree
+    full = 2 ** (n + 1) - 1
+    start = time.perf_counter()
+    expected = enumerate_check(knowledge, query)
+    full_time = time.perf_counter() - start
+
+    stats = dict()
+    start = time.perf_counter()
+    if prune_check(knowledge, query, stats) != expected:
+        raise Exception("prune_check disagrees with enumerate_check")
+    pruned_time = time.perf_counter() - start
+
+    return full, stats["nodes"], full_time, pruned_time
+
+
+def compare_backends(sizes):
+    """
+    Prints the time and peak memory every backend needs to solve a
+    generated puzzle with each of the given numbers of characters.
+    """
+    print(f"{'characters':>10} {'symbols':>7} {'backend':>9} "
+          f"{'time (s)':>9} {'peak (KiB)':>11} {'solved':>6}")
+    for n in sizes:
+        for backend, elapsed, peak, solved in solve(n):
+            print(f"{n:>10} {2 * n:>7} {backend:>9} "
+                  f"{column(elapsed, '.4f', 9)} "
+                  f"{column(peak and peak / 1024, '.1f', 11)} "
+                  f"{column(solved, 'd', 6)}")
+
+
+def column(value, spec, width):
+    """Formats a table cell, showing a dash for missing values."""
+    if value is None:
+        return f"{'-':>{width}}"
+    return f"{value:>{width}{spec}}"
+
+
+def solve(n, seed=0):
+    """
+    Generates a puzzle with `n` characters and asks every backend which
+    role of each character it entails.
+    Returns a list of (backend, time, peak memory, solved) rows, where
+    solved is the number of characters whose role was determined.
+    Backends above their limit are reported with a time of None.
+    Raises an Exception if two backends disagree, or if one entails a
+    role the hidden solution contradicts.
+    """
+    characters, knowledge, roles = random_puzzle(n, DEPTH, seed)
+    queries = []
+    for name, _ in characters:
+        queries.extend([knight(name), knave(name)])
+
+    rows = []
+    expected = None
+    for backend in sorted(BACKENDS):
+        if n > LIMITS[backend]:
+            rows.append((backend, None, None, None))
+            continue
+
+        start = time.perf_counter()
+        entailed = model_check_many(knowledge, queries, backend)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        model_check_many(knowledge, queries, backend)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if expected is None:
+            expected = entailed
+        elif entailed != expected:
+            raise Exception(f"{backend} disagrees with the other backends")
+        for (name, _), knows_knight, knows_knave in zip(
+                characters, entailed[::2], entailed[1::2]):
+            if knows_knight and not roles[name] or knows_knave and roles[name]:
+                raise Exception(f"{backend} contradicts the solution for {name}")
+        rows.append((backend, elapsed, peak,
+                     sum(entailed[::2]) + sum(entailed[1::2])))
+
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import random
+import string
+import sys
+
+from logic import *
+
+
+def main():
+    if len(sys.argv) not in range(2, 5):
+        sys.exit("Usage: python generate.py characters [depth] [seed]")
+    n = int(sys.argv[1])
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    characters, knowledge, roles = random_puzzle(n, depth, seed)
+    for name, statement in characters:
+        print(f"{name} says \"{statement.formula()}\"")
+    print("Solution")
+    for name, _ in characters:
+        print(f"    {name} is a {'Knight' if roles[name] else 'Knave'}")
+
+
+def character_names(n):
+    """Returns `n` character names: A to Z, then A1 to Z1, and so on."""
+    return [
+        string.ascii_uppercase[i % 26] + (str(i // 26) if i >= 26 else "")
+        for i in range(n)
+    ]
+
+
+def knight(name):
+    """Returns the symbol for "`name` is a Knight"."""
+    return Symbol(f"{name} is a Knight")
+
+
+def knave(name):
+    """Returns the symbol for "`name` is a Knave"."""
+    return Symbol(f"{name} is a Knave")
+
+
+def random_statement(names, depth, rng):
+    """
+    Returns a random statement about the characters in `names`, nesting
+    connectives up to `depth` levels deep.
+    """
+    if depth == 0 or rng.random() < 0.3:
+        name = rng.choice(names)
+        return knight(name) if rng.random() < 0.5 else knave(name)
+    kind = rng.randrange(5)
+    if kind == 0:
+        return Not(random_statement(names, depth - 1, rng))
+    if kind == 1:
+        return And(*[random_statement(names, depth - 1, rng)
+                     for _ in range(rng.randint(2, 3))])
+    if kind == 2:
+        return Or(*[random_statement(names, depth - 1, rng)
+                    for _ in range(rng.randint(2, 3))])
+    if kind == 3:
+        return Implication(random_statement(names, depth - 1, rng),
+                           random_statement(names, depth - 1, rng))
+    return Biconditional(random_statement(names, depth - 1, rng),
+                         random_statement(names, depth - 1, rng))
+
+
+def random_puzzle(n, depth=2, seed=None):
+    """
+    Returns a random knights and knaves puzzle with `n` characters,
+    each making one statement nested up to `depth` levels deep.
+
+    Returns a list of (name, statement) pairs, the knowledge base in the
+    style of puzzle.py, and the hidden roles used to build it: a dict
+    from name to True for knights and False for knaves. Statements are
+    true exactly when their speaker is a knight in the hidden roles, so
+    the knowledge base always has at least that solution.
+    """
+    rng = random.Random(seed)
+    names = character_names(n)
+    roles = {name: rng.random() < 0.5 for name in names}
+    model = dict()
+    for name in names:
+        model[knight(name).name] = roles[name]
+        model[knave(name).name] = not roles[name]
+
+    characters = []
+    knowledge = []
+    for name in names:
+        knowledge.append(Or(knight(name), knave(name)))
+        knowledge.append(Not(And(knight(name), knave(name))))
+    for name in names:
+        statement = random_statement(names, depth, rng)
+        if statement.evaluate(model) != roles[name]:
+            statement = Not(statement)
+        characters.append((name, statement))
+        knowledge.append(Biconditional(statement, knight(name)))
+
+    return characters, And(*knowledge), roles
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import random
+import unittest
+
+from generate import knight, knave, random_puzzle, random_statement
+from logic import *
+
+# Nesting deeper than the default recursion limit
+DEPTH = 2000
+
+
+def nested(depth):
+    """
+    Returns a sentence `depth` connectives deep over symbols a and b,
+    alternating negations and conjunctions that repeat a subsentence.
+    Every four levels of it are equivalent to a.
+    """
+    a = Symbol("a")
+    b = Symbol("b")
+    sentence = a
+    for i in range(depth):
+        if i % 2:
+            sentence = And(Or(sentence, b), Not(Not(a)))
+        else:
+            sentence = Not(sentence)
+    return sentence
+
+
+def chain(length):
+    """
+    Returns the symbols X0000, X0001, ... of a chain of `length`
+    implications, each symbol implying the next, and the chain.
+    """
+    symbols = [Symbol(f"X{i:04}") for i in range(length)]
+    return symbols, And(*[
+        Implication(symbols[i], symbols[i + 1]) for i in range(length - 1)
+    ])
+
+
+class TestDeepNesting(unittest.TestCase):
+
+    def test_compiled(self):
+        sentence = nested(DEPTH)
+        evaluate = sentence.compiled(["a", "b"])
+
+        # All four models at once: bit k of each value is model k
+        self.assertEqual(evaluate([0b1010, 0b1100], 0b1111), 0b1010)
+        self.assertEqual(nested(DEPTH + 1).compiled(["a", "b"])(
+            [0b1010, 0b1100], 0b1111), 0b0101)
+
+    def test_model_check(self):
+        a = Symbol("a")
+        sentence = nested(DEPTH)
+        self.assertTrue(model_check(And(sentence, a), a))
+        self.assertFalse(model_check(sentence, Not(a)))
+
+    def test_sat(self):
+        a = Symbol("a")
+        sentence = nested(DEPTH)
+        self.assertTrue(model_check(And(sentence, a), a, "sat"))
+        self.assertFalse(model_check(sentence, Not(a), "sat"))
+        self.assertEqual(model_check_many(sentence, [a, Not(a)], "sat"),
+                         [True, False])
+
+    def test_prune(self):
+        a = Symbol("a")
+        sentence = nested(DEPTH)
+        self.assertTrue(model_check(And(sentence, a), a, "prune"))
+        self.assertFalse(model_check(sentence, Not(a), "prune"))
+        self.assertIsNone(sentence.evaluate_partial({"a": True}))
+        self.assertTrue(sentence.evaluate_partial({"a": True, "b": True}))
+
+    def test_formula(self):
+        sentence = nested(DEPTH)
+        self.assertEqual(sentence.formula().count("¬"), 3 * DEPTH // 2)
+
+
+class TestChains(unittest.TestCase):
+
+    def test_prune(self):
+        symbols, implications = chain(DEPTH)
+        knowledge = And(symbols[0], implications)
+        self.assertTrue(model_check(knowledge, symbols[-1], "prune"))
+        self.assertFalse(model_check(knowledge, Not(symbols[-1]), "prune"))
+
+    def test_count_models(self):
+
+        # A chain holds when its symbols are false up to some point
+        # and true after it
+        symbols, implications = chain(DEPTH)
+        self.assertEqual(count_models(implications), DEPTH + 1)
+        self.assertEqual(count_models(And(symbols[0], implications)), 1)
+
+
+class TestSolver(unittest.TestCase):
+
+    def puzzles(self):
+        """
+        Yields random puzzles as a knowledge base and a list of queries:
+        every character's role and random statements about them.
+        """
+        rng = random.Random(0)
+        for seed in range(40):
+            n = rng.randint(1, 5)
+            characters, knowledge, _ = random_puzzle(n, 3, seed)
+            names = [name for name, _ in characters]
+            queries = [knight(name) for name in names]
+            queries += [knave(name) for name in names]
+            queries += [random_statement(names, 2, rng) for _ in range(5)]
+            yield knowledge, queries
+
+    def test_sat_check(self):
+        for knowledge, queries in self.puzzles():
+            for query in queries:
+                self.assertEqual(sat_check(knowledge, query),
+                                 enumerate_check(knowledge, query))
+
+    def test_sat_check_many(self):
+        for knowledge, queries in self.puzzles():
+            self.assertEqual(
+                sat_check_many(knowledge, queries),
+                [enumerate_check(knowledge, query) for query in queries]
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
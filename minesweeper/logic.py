@@ -1,19 +1,203 @@
+import functools
+import heapq
 import itertools
+import multiprocessing
+import os
+import re
+import weakref
+
+# Values of sentences in partial models, by their compiled form
+PARTIAL_VALUES = (None, True, False)
 
 
 class Sentence():
+    """
+    Immutable logical sentence.
+
+    Sentences are hash-consed: building a sentence equal to an existing
+    one returns the existing object, so equal sentences are identical,
+    and each sentence computes its hash and symbols only once.
+    """
+
+    __slots__ = ("_hash", "_symbols", "_compiled", "__weakref__")
+
+    # Every live sentence, keyed by its class and arguments
+    interned = weakref.WeakValueDictionary()
+
+    @classmethod
+    def intern(cls, args, symbols, **attributes):
+        """
+        Returns the sentence of this class built from `args`, creating
+        it with the given attributes if it does not exist yet.
+        `symbols` is called to compute the symbols of a new sentence.
+        """
+        key = (cls, args)
+        sentence = Sentence.interned.get(key)
+        if sentence is None:
+            sentence = object.__new__(cls)
+            for name, value in attributes.items():
+                object.__setattr__(sentence, name, value)
+            object.__setattr__(sentence, "_hash", hash(key))
+            object.__setattr__(sentence, "_symbols", frozenset(symbols()))
+            object.__setattr__(sentence, "_compiled", None)
+            Sentence.interned[key] = sentence
+        return sentence
+
+    def arguments(self):
+        """Returns the arguments the sentence was built from."""
+        return ()
+
+    def __reduce__(self):
+        return (type(self), self.arguments())
+
+    def __hash__(self):
+        return self._hash
+
+    def __setattr__(self, name, value):
+        raise AttributeError("logical sentences are immutable")
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def evaluate_partial(self, model):
+        """
+        Evaluates the logical sentence in a model that may leave symbols
+        unassigned. Returns None if the value depends on them.
+        """
+        symbols = sorted(self.symbols())
+        evaluate = self.compiled(symbols, partial=True)
+        values = [
+            0 if model.get(symbol) is None else 1 if model[symbol] else 2
+            for symbol in symbols
+        ]
+        return PARTIAL_VALUES[evaluate(values)]
+
     def formula(self):
         """Returns string formula representing logical sentence."""
-        return ""
+
+        # Expand pieces from a stack, so every node is visited once
+        # and deep sentences do not recurse
+        parts = []
+        stack = [(self, False)]
+        while stack:
+            piece = stack.pop()
+            if isinstance(piece, str):
+                parts.append(piece)
+            else:
+                sentence, operand = piece
+                if operand:
+                    stack.extend(reversed(sentence.operand_pieces()))
+                else:
+                    stack.extend(reversed(sentence.pieces()))
+        return "".join(parts)
+
+    def pieces(self):
+        """
+        Returns the pieces of the formula: strings, and (sentence, operand)
+        pairs standing for the formula of a subsentence, written as an
+        operand of a larger formula if `operand` is true.
+        """
+        return []
+
+    def operand_pieces(self):
+        """
+        Returns the pieces of the formula as an operand of a larger
+        formula, parenthesized unless it is a single symbol.
+        """
+        return ["(", (self, False), ")"]
 
     def symbols(self):
-        """Returns a set of all symbols in the logical sentence."""
-        return set()
+        """Returns a frozenset of all symbols in the logical sentence."""
+        return self._symbols
+
+    def operands(self):
+        """Returns the subsentences the logical sentence is built from."""
+        return ()
+
+    def expression(self, index, names):
+        """
+        Returns a Python expression computing the logical sentence
+        from `names`, the names its operands were emitted into.
+        """
+        raise Exception("nothing to compile")
+
+    def partial_expression(self, index, names):
+        """
+        Returns a Python expression computing the logical sentence in a
+        partial model from the names its operands were emitted into,
+        where values are 1 for true, 2 for false and 0 for unknown.
+        """
+        raise Exception("nothing to compile")
+
+    def emit(self, index, lines, partial=False):
+        """
+        Appends statements computing the logical sentence to `lines`,
+        one per sentence object, and returns the name of its value.
+        The statements evaluate partial models if `partial` is true.
+        """
+
+        # Emit operands before the sentences using them, in post-order
+        # from a stack, so deep sentences do not recurse
+        emitted = dict()
+        stack = [(self, False)]
+        while stack:
+            sentence, expanded = stack.pop()
+            if id(sentence) in emitted:
+                continue
+            if expanded:
+                names = [emitted[id(operand)]
+                         for operand in sentence.operands()]
+                if partial:
+                    expression = sentence.partial_expression(index, names)
+                else:
+                    expression = sentence.expression(index, names)
+                emitted[id(sentence)] = f"t{len(lines)}"
+                lines.append(f"t{len(lines)} = {expression}")
+            else:
+                stack.append((sentence, True))
+                stack.extend((operand, False)
+                             for operand in reversed(sentence.operands()))
+        return emitted[id(self)]
+
+    def compiled(self, symbols, partial=False):
+        """
+        Returns a function `evaluate(values, full)` for the logical
+        sentence over bit-packed models: bit k of values[i] is the value
+        of symbols[i] in model k, `full` has a bit set for every model,
+        and the result has bit k set if the sentence is true in model k.
+        A single model is evaluated with 0/1 values and a `full` of 1.
+
+        If `partial`, returns a function `evaluate(values)` for one model
+        that may leave symbols unassigned instead: values[i] is 1 if
+        symbols[i] is true, 2 if it is false and 0 if it is unassigned,
+        and the result is the value of the sentence in the same form.
+        Compiled functions are cached per symbol order.
+        """
+        key = (tuple(symbols), partial)
+        if self._compiled is None:
+            object.__setattr__(self, "_compiled", dict())
+        cache = self._compiled
+        if key not in cache:
+            index = {symbol: i for i, symbol in enumerate(symbols)}
+            lines = []
+            result = self.emit(index, lines, partial)
+            arguments = "v" if partial else "v, full"
+            source = f"def evaluate({arguments}):\n" + "".join(
+                f"    {line}\n" for line in lines
+            ) + f"    return {result}\n"
+            namespace = dict()
+            exec(source, namespace)
+            cache[key] = namespace["evaluate"]
+        return cache[key]
+
+    def encode(self, cnf, literals):
+        """
+        Returns a literal of `cnf` that is true exactly when the logical
+        sentence is, given `literals`, the literals of its operands,
+        adding the clauses that define it to `cnf`.
+        """
+        raise Exception("nothing to encode")
 
     @classmethod
     def validate(cls, sentence):
@@ -43,15 +227,13 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
 
-    def __init__(self, name):
-        self.name = name
+    def __new__(cls, name):
+        return cls.intern((name,), lambda: (name,), name=name)
 
-    def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
-
-    def __hash__(self):
-        return hash(("symbol", self.name))
+    def arguments(self):
+        return (self.name,)
 
     def __repr__(self):
         return self.name
@@ -62,23 +244,34 @@ class Symbol(Sentence):
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
-    def formula(self):
-        return self.name
+    def pieces(self):
+        return [self.name]
 
-    def symbols(self):
-        return {self.name}
+    def operand_pieces(self):
+        return [Sentence.parenthesize(self.name)]
+
+    def expression(self, index, names):
+        try:
+            return f"v[{index[self.name]}]"
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
+
+    def partial_expression(self, index, names):
+        return self.expression(index, names)
+
+    def encode(self, cnf, literals):
+        return cnf.variable(self.name)
 
 
 class Not(Sentence):
-    def __init__(self, operand):
-        Sentence.validate(operand)
-        self.operand = operand
+    __slots__ = ("operand",)
 
-    def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+    def __new__(cls, operand):
+        Sentence.validate(operand)
+        return cls.intern((operand,), operand.symbols, operand=operand)
 
-    def __hash__(self):
-        return hash(("not", hash(self.operand)))
+    def arguments(self):
+        return (self.operand,)
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -86,27 +279,37 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
-    def formula(self):
-        return "¬" + Sentence.parenthesize(self.operand.formula())
+    def pieces(self):
+        return ["¬", (self.operand, True)]
 
-    def symbols(self):
-        return self.operand.symbols()
+    def operands(self):
+        return (self.operand,)
+
+    def expression(self, index, names):
+        return f"full ^ {names[0]}"
+
+    def partial_expression(self, index, names):
+        return f"(({names[0]} & 1) << 1) | ({names[0]} >> 1)"
+
+    def encode(self, cnf, literals):
+        return -literals[0]
 
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
+    __slots__ = ("conjuncts",)
+
+    def __new__(cls, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
-
-    def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
+        return cls.intern(
+            conjuncts,
+            lambda: frozenset().union(*[c.symbols() for c in conjuncts]),
+            conjuncts=conjuncts
         )
 
+    def arguments(self):
+        return self.conjuncts
+
     def __repr__(self):
         conjunctions = ", ".join(
             [str(conjunct) for conjunct in self.conjuncts]
@@ -114,36 +317,69 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
-        Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
+        raise TypeError("logical sentences are immutable, "
+                        "use And(*knowledge.conjuncts, conjunct) instead")
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
-    def formula(self):
+    def pieces(self):
         if len(self.conjuncts) == 1:
-            return self.conjuncts[0].formula()
-        return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
-                           for conjunct in self.conjuncts])
+            return [(self.conjuncts[0], False)]
+        pieces = []
+        for conjunct in self.conjuncts:
+            if pieces:
+                pieces.append(" ∧ ")
+            pieces.append((conjunct, True))
+        return pieces
+
+    def operand_pieces(self):
+        if len(self.conjuncts) == 1:
+            return [(self.conjuncts[0], True)]
+        if not self.conjuncts:
+            return []
+        return Sentence.operand_pieces(self)
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def operands(self):
+        return self.conjuncts
+
+    def expression(self, index, names):
+        if not names:
+            return "full"
+        return " & ".join(names)
+
+    def partial_expression(self, index, names):
+
+        # True if every conjunct is, false if any is
+        if not names:
+            return "1"
+        return f"({' & '.join(names)} & 1) | (({' | '.join(names)}) & 2)"
+
+    def encode(self, cnf, literals):
+        if len(literals) == 1:
+            return literals[0]
+        x = cnf.variable()
+        for conjunct in literals:
+            cnf.clauses.append([-x, conjunct])
+        cnf.clauses.append([x] + [-conjunct for conjunct in literals])
+        return x
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+    __slots__ = ("disjuncts",)
+
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
-
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
+        return cls.intern(
+            disjuncts,
+            lambda: frozenset().union(*[d.symbols() for d in disjuncts]),
+            disjuncts=disjuncts
         )
 
+    def arguments(self):
+        return self.disjuncts
+
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
         return f"Or({disjuncts})"
@@ -151,30 +387,62 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
-    def formula(self):
+    def pieces(self):
+        if len(self.disjuncts) == 1:
+            return [(self.disjuncts[0], False)]
+        pieces = []
+        for disjunct in self.disjuncts:
+            if pieces:
+                pieces.append(" ∨  ")
+            pieces.append((disjunct, True))
+        return pieces
+
+    def operand_pieces(self):
         if len(self.disjuncts) == 1:
-            return self.disjuncts[0].formula()
-        return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
-                            for disjunct in self.disjuncts])
+            return [(self.disjuncts[0], True)]
+        if not self.disjuncts:
+            return []
+        return Sentence.operand_pieces(self)
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def operands(self):
+        return self.disjuncts
+
+    def expression(self, index, names):
+        if not names:
+            return "0"
+        return " | ".join(names)
+
+    def partial_expression(self, index, names):
+
+        # True if any disjunct is, false if every one is
+        if not names:
+            return "2"
+        return f"(({' | '.join(names)}) & 1) | ({' & '.join(names)} & 2)"
+
+    def encode(self, cnf, literals):
+        if len(literals) == 1:
+            return literals[0]
+        x = cnf.variable()
+        for disjunct in literals:
+            cnf.clauses.append([x, -disjunct])
+        cnf.clauses.append([-x] + literals)
+        return x
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+    __slots__ = ("antecedent", "consequent")
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
-
-    def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return cls.intern(
+            (antecedent, consequent),
+            lambda: antecedent.symbols() | consequent.symbols(),
+            antecedent=antecedent, consequent=consequent
+        )
 
-    def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+    def arguments(self):
+        return (self.antecedent, self.consequent)
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -183,29 +451,47 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
-    def formula(self):
-        antecedent = Sentence.parenthesize(self.antecedent.formula())
-        consequent = Sentence.parenthesize(self.consequent.formula())
-        return f"{antecedent} => {consequent}"
+    def pieces(self):
+        return [(self.antecedent, True), " => ", (self.consequent, True)]
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def operands(self):
+        return (self.antecedent, self.consequent)
+
+    def expression(self, index, names):
+        antecedent, consequent = names
+        return f"(full ^ {antecedent}) | {consequent}"
+
+    def partial_expression(self, index, names):
+
+        # True if the antecedent is false or the consequent true,
+        # false if the antecedent is true and the consequent false
+        antecedent, consequent = names
+        return (f"((({antecedent} >> 1) | {consequent}) & 1)"
+                f" | (({antecedent} << 1) & {consequent})")
+
+    def encode(self, cnf, literals):
+        antecedent, consequent = literals
+        x = cnf.variable()
+        cnf.clauses.append([-x, -antecedent, consequent])
+        cnf.clauses.append([x, antecedent])
+        cnf.clauses.append([x, -consequent])
+        return x
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+    __slots__ = ("left", "right")
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
-
-    def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return cls.intern(
+            (left, right),
+            lambda: left.symbols() | right.symbols(),
+            left=left, right=right
+        )
 
-    def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+    def arguments(self):
+        return (self.left, self.right)
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -216,48 +502,1128 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
-    def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
-        return f"{left} <=> {right}"
-
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
-
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
-
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
-
-        # If model has an assignment for each symbol
-        if not symbols:
-
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
+    def pieces(self):
+        return [(self.left, True), " <=> ", (self.right, True)]
+
+    def operands(self):
+        return (self.left, self.right)
+
+    def expression(self, index, names):
+        left, right = names
+        return f"full ^ {left} ^ {right}"
+
+    def partial_expression(self, index, names):
+
+        # Known only if both sides are: true if they agree
+        left, right = names
+        return f"1 if {left} & {right} else 2 if {left} ^ {right} == 3 else 0"
+
+    def encode(self, cnf, literals):
+        left, right = literals
+        x = cnf.variable()
+        cnf.clauses.append([-x, -left, right])
+        cnf.clauses.append([-x, left, -right])
+        cnf.clauses.append([x, left, right])
+        cnf.clauses.append([x, -left, -right])
+        return x
+
+
+class CNF():
+    """
+    Logical sentences in conjunctive normal form, as lists of clauses of
+    integer literals: variable v is the literal v, and its negation -v.
+
+    Symbols are numbered from 1, and every compound subsentence gets an
+    extra variable defined to be equivalent to it (Tseitin encoding),
+    so the clauses grow linearly with the sentences.
+    """
+
+    def __init__(self):
+        self.variables = dict()
+        self.names = [None]
+        self.clauses = []
+        self.definitions = dict()
+
+    def variable(self, name=None):
+        """
+        Returns the variable of the symbol `name`,
+        or a new unnamed variable if `name` is None.
+        """
+        if name in self.variables:
+            return self.variables[name]
+        self.names.append(name)
+        if name is not None:
+            self.variables[name] = len(self.names) - 1
+        return len(self.names) - 1
+
+    def literal(self, sentence):
+        """
+        Returns a literal equivalent to `sentence`, encoding every
+        sentence only once.
+        """
+        literal = self.definitions.get(sentence)
+        if literal is not None:
+            return literal
+        Sentence.validate(sentence)
+
+        # Encode operands before the sentences using them, in post-order
+        # from a stack, so deep sentences do not recurse
+        stack = [(sentence, False)]
+        while stack:
+            current, expanded = stack.pop()
+            if current in self.definitions:
+                continue
+            if expanded:
+                literals = [self.definitions[operand]
+                            for operand in current.operands()]
+                self.definitions[current] = current.encode(self, literals)
+            else:
+                stack.append((current, True))
+                stack.extend((operand, False)
+                             for operand in reversed(current.operands()))
+        return self.definitions[sentence]
+
+    def add(self, sentence):
+        """Adds clauses that can only be satisfied if `sentence` is true."""
+        Sentence.validate(sentence)
+        stack = [sentence]
+        while stack:
+            sentence = stack.pop()
+            if isinstance(sentence, And):
+                stack.extend(reversed(sentence.conjuncts))
+            elif isinstance(sentence, Or):
+                self.clauses.append(
+                    [self.literal(disjunct) for disjunct in sentence.disjuncts]
+                )
+            else:
+                self.clauses.append([self.literal(sentence)])
+
+
+class Solver():
+    """
+    CDCL satisfiability solver over the clauses of a CNF.
+
+    Unit propagation watches two literals per clause, every conflict
+    is turned into a learned clause at its first unique implication
+    point, and decisions follow the variables most active in recent
+    conflicts. Clauses can be added between calls to `solve`, and
+    learned clauses are kept, so related problems get faster.
+    """
+
+    # Activity decay per conflict, and conflicts before the first restart
+    DECAY = 0.95
+    RESTART = 100
+
+    def __init__(self, clauses=()):
+        self.value = [None]
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.phase = [False]
+        self.watches = dict()
+        self.clauses = []
+        self.learned = []
+        self.trail = []
+        self.trail_lim = []
+        self.head = 0
+        self.heap = []
+        self.increment = 1.0
+        self.ok = True
+        self.model = None
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def reserve(self, var):
+        """Makes room for every variable up to `var`."""
+        while len(self.value) <= var:
+            heapq.heappush(self.heap, (0.0, len(self.value)))
+            self.value.append(None)
+            self.level.append(0)
+            self.reason.append(None)
+            self.activity.append(0.0)
+            self.phase.append(False)
+
+    def variables(self):
+        """Returns the number of variables."""
+        return len(self.value) - 1
+
+    def literal_value(self, literal):
+        """Returns True, False or None (unassigned) for a literal."""
+        value = self.value[abs(literal)]
+        if value is None or literal > 0:
+            return value
+        return not value
+
+    def add_clause(self, literals):
+        """
+        Adds a clause to the solver.
+        Returns False if the clauses can no longer be satisfied.
+        """
+        self.backtrack(0)
+        clause = []
+        seen = set()
+        for literal in literals:
+            self.reserve(abs(literal))
+            value = self.literal_value(literal)
+            if value is True or -literal in seen:
+                return self.ok
+            if value is None and literal not in seen:
+                seen.add(literal)
+                clause.append(literal)
+
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            if self.propagate() is not None:
+                self.ok = False
         else:
-
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
+            self.clauses.append(clause)
+            self.watch(clause)
+        return self.ok
+
+    def watch(self, clause):
+        """Watches the first two literals of a clause."""
+        self.watches.setdefault(clause[0], []).append(clause)
+        self.watches.setdefault(clause[1], []).append(clause)
+
+    def assign(self, literal, reason):
+        """Makes `literal` true at the current decision level."""
+        var = abs(literal)
+        self.value[var] = literal > 0
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Assigns every literal implied by unit clauses.
+        Returns a clause with all literals false, or None.
+        """
+        while self.head < len(self.trail):
+            false_literal = -self.trail[self.head]
+            self.head += 1
+            watchers = self.watches.get(false_literal, [])
+            kept = []
+            for i, clause in enumerate(watchers):
+
+                # Keep the false literal second
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self.literal_value(clause[0]) is True:
+                    kept.append(clause)
+                    continue
+
+                # Watch another literal that is not false, if any
+                for k in range(2, len(clause)):
+                    if self.literal_value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches.setdefault(clause[1], []).append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if self.literal_value(clause[0]) is False:
+                        kept.extend(watchers[i + 1:])
+                        self.watches[false_literal] = kept
+                        return clause
+                    self.assign(clause[0], clause)
+            self.watches[false_literal] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Resolves the conflict back to the first unique implication point.
+        Returns the learned clause, whose first literal is the one to
+        assert, and the decision level to backtrack to.
+        """
+        level = len(self.trail_lim)
+        learned = [None]
+        seen = set()
+        counter = 0
+        literal = None
+        index = len(self.trail) - 1
+        clause = conflict
+        while True:
+            for other in clause:
+                var = abs(other)
+                if other == literal or var in seen or self.level[var] == 0:
+                    continue
+                seen.add(var)
+                self.bump(var)
+                if self.level[var] == level:
+                    counter += 1
+                else:
+                    learned.append(other)
+
+            # Resolve on the latest assigned literal of the conflict
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            clause = self.reason[abs(literal)]
+            counter -= 1
+            if counter == 0:
+                break
+        learned[0] = -literal
+
+        # Backtrack to the second highest level in the clause
+        backtrack_level = 0
+        if len(learned) > 1:
+            highest = max(range(1, len(learned)),
+                          key=lambda i: self.level[abs(learned[i])])
+            learned[1], learned[highest] = learned[highest], learned[1]
+            backtrack_level = self.level[abs(learned[1])]
+        return learned, backtrack_level
+
+    def bump(self, var):
+        """Increases the activity of a variable involved in a conflict."""
+        self.activity[var] += self.increment
+        if self.activity[var] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[v], v)
+                         for v in range(1, len(self.value))
+                         if self.value[v] is None]
+            heapq.heapify(self.heap)
+
+    def backtrack(self, level):
+        """Undoes every assignment above decision level `level`."""
+        if len(self.trail_lim) <= level:
+            return
+        for literal in self.trail[self.trail_lim[level]:]:
+            var = abs(literal)
+            self.phase[var] = self.value[var]
+            self.value[var] = None
+            self.reason[var] = None
+            heapq.heappush(self.heap, (-self.activity[var], var))
+        del self.trail[self.trail_lim[level]:]
+        del self.trail_lim[level:]
+        self.head = len(self.trail)
+
+    def pick(self):
+        """Returns the unassigned variable with the highest activity."""
+        if len(self.heap) > 4 * len(self.value) + 100:
+            self.heap = [(-self.activity[v], v)
+                         for v in range(1, len(self.value))
+                         if self.value[v] is None]
+            heapq.heapify(self.heap)
+        while self.heap:
+            _, var = heapq.heappop(self.heap)
+            if self.value[var] is None:
+                return var
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Checks if the clauses are satisfiable with every literal in
+        `assumptions` true. If so, returns True and stores a satisfying
+        assignment in `self.model`, a list of values indexed by variable.
+        """
+        self.model = None
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        for literal in assumptions:
+            self.reserve(abs(literal))
+
+        conflicts = 0
+        restart = self.RESTART
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+
+                # A conflict without decisions can never be resolved
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                learned, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.learned.append(learned)
+                    self.watch(learned)
+                    self.assign(learned[0], learned)
+                self.increment /= self.DECAY
+                conflicts += 1
+                continue
+
+            if conflicts >= restart:
+                self.backtrack(0)
+                conflicts = 0
+                restart = int(restart * 1.5)
+                continue
+
+            # Decide the assumptions first, one decision level each
+            level = len(self.trail_lim)
+            if level < len(assumptions):
+                literal = assumptions[level]
+                value = self.literal_value(literal)
+                if value is False:
+                    self.backtrack(0)
+                    return False
+                if value is True:
+                    self.trail_lim.append(len(self.trail))
+                    continue
+            else:
+                var = self.pick()
+                if var is None:
+                    self.model = list(self.value)
+                    self.backtrack(0)
+                    return True
+                literal = var if self.phase[var] else -var
+            self.trail_lim.append(len(self.trail))
+            self.assign(literal, None)
+
+
+# Number of symbols enumerated together in one bit-packed evaluation
+BLOCK_SYMBOLS = 16
+
+
+def symbol_patterns(count):
+    """
+    Returns the bit-packed values of the first `count` symbols over all
+    2^count models, where bit k of the i-th value is bit i of k,
+    together with the mask of all models.
+    """
+    size = 1 << count
+    full = (1 << size) - 1
+    patterns = []
+    for i in range(count):
+        width = 1 << i
+
+        # One bit at the start of every run of 2 * width models
+        starts = full // ((1 << (2 * width)) - 1)
+        patterns.append(starts * (((1 << width) - 1) << width))
+    return patterns, full
+
+
+def model_blocks(symbols):
+    """Returns the number of model blocks enumerate_check evaluates."""
+    return 1 << max(0, len(symbols) - BLOCK_SYMBOLS)
+
+
+def check_blocks(knowledge, query, symbols, start, stop, cancelled=None):
+    """
+    Checks if knowledge base entails query in model blocks `start` up
+    to `stop` over the sorted `symbols`. Returns None without finishing
+    if the `cancelled` event is set.
+    """
+
+    # Compile both sentences over bit-packed models
+    knowledge = knowledge.compiled(symbols)
+    query = query.compiled(symbols)
+
+    # Evaluate blocks of 2^BLOCK_SYMBOLS models at once, enumerating
+    # the remaining symbols one model block at a time
+    block = min(len(symbols), BLOCK_SYMBOLS)
+    values, full = symbol_patterns(block)
+    values.extend(0 for _ in range(len(symbols) - block))
+    for high in range(start, stop):
+        if cancelled is not None and cancelled.is_set():
+            return None
+        for i in range(block, len(symbols)):
+            values[i] = full if high >> (i - block) & 1 else 0
+
+        # Knowledge entails query if query is true in every model of knowledge
+        if knowledge(values, full) & ~query(values, full):
+            return False
+    return True
+
+
+def enumerate_check(knowledge, query):
+    """Checks if knowledge base entails query by enumerating all models."""
 
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
-
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
\ No newline at end of file
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    return check_blocks(knowledge, query, symbols, 0, model_blocks(symbols))
+
+
+# Set in each worker process of parallel_check once a counter-model is found
+cancelled = None
+
+
+def start_worker(event):
+    """Initializes a worker process of parallel_check."""
+    global cancelled
+    cancelled = event
+
+
+def check_cube(knowledge, query, symbols, size, start):
+    """Checks one cube of parallel_check in a worker process."""
+    return check_blocks(knowledge, query, symbols, start, start + size,
+                        cancelled)
+
+
+def parallel_check(knowledge, query, processes=None):
+    """
+    Checks if knowledge base entails query by enumerating all models
+    in a pool of processes. Fixing the first symbols splits the models
+    into cubes, a few per process, and the first counter-model found
+    cancels the remaining cubes.
+    """
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    blocks = model_blocks(symbols)
+    processes = processes or os.cpu_count() or 1
+    if blocks == 1 or processes == 1:
+        return check_blocks(knowledge, query, symbols, 0, blocks)
+
+    cubes = min(blocks, 1 << (4 * processes - 1).bit_length())
+    size = blocks // cubes
+    event = multiprocessing.Event()
+    with multiprocessing.Pool(processes, start_worker, (event,)) as pool:
+        check = functools.partial(check_cube, knowledge, query, symbols, size)
+        for result in pool.imap_unordered(check, range(0, blocks, size)):
+            if result is False:
+
+                # Leaving the pool terminates the cubes still running
+                event.set()
+                return False
+    return True
+
+
+def enumerate_check_many(knowledge, queries):
+    """
+    Checks which queries knowledge base entails, enumerating all models
+    once for every query together.
+    """
+    symbols = sorted(knowledge.symbols().union(
+        *[query.symbols() for query in queries]
+    ))
+    knowledge = knowledge.compiled(symbols)
+    unresolved = {i: query.compiled(symbols) for i, query in enumerate(queries)}
+    entailed = [True] * len(queries)
+
+    block = min(len(symbols), BLOCK_SYMBOLS)
+    values, full = symbol_patterns(block)
+    values.extend(0 for _ in range(len(symbols) - block))
+    for high in range(1 << (len(symbols) - block)):
+        for i in range(block, len(symbols)):
+            values[i] = full if high >> (i - block) & 1 else 0
+
+        # Drop every query that is false in some model of knowledge
+        models = knowledge(values, full)
+        for i, query in list(unresolved.items()):
+            if models & ~query(values, full):
+                entailed[i] = False
+                del unresolved[i]
+        if not unresolved:
+            break
+    return entailed
+
+
+def prune_check(knowledge, query, stats=None):
+    """
+    Checks if knowledge base entails query, abandoning every partial
+    model in which the knowledge base is already false, or in which
+    the knowledge base and the query are both already decided.
+    If `stats` is a dictionary, counts the visited models in "nodes".
+    """
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    knowledge = knowledge.compiled(symbols, partial=True)
+    query = query.compiled(symbols, partial=True)
+
+    # Symbols are assigned in place, in order, with one (index, value)
+    # frame each, and the next branch is found by undoing frames.
+    # Values are 1 for true, 2 for false and 0 for unassigned.
+    values = [0] * len(symbols)
+    frames = []
+    while True:
+        if stats is not None:
+            stats["nodes"] = stats.get("nodes", 0) + 1
+
+        # If knowledge base is true, the query decides entailment
+        value = knowledge(values)
+        if value == 1:
+            value = query(values)
+            if value == 2:
+                return False
+        elif value == 2:
+            value = 1
+
+        # Assign the next symbol while the model leaves entailment open
+        if value == 0:
+            values[len(frames)] = 1
+            frames.append((len(frames), 1))
+            continue
+
+        # Otherwise undo assignments until one can still be made false
+        while frames and frames[-1][1] == 2:
+            i, _ = frames.pop()
+            values[i] = 0
+        if not frames:
+            return True
+        i, _ = frames.pop()
+        values[i] = 2
+        frames.append((i, 2))
+
+
+def sat_check(knowledge, query):
+    """
+    Checks if knowledge base entails query by proving that
+    knowledge and not query cannot be satisfied.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    cnf.add(Not(query))
+    return not Solver(cnf.clauses).solve()
+
+
+def sat_check_many(knowledge, queries):
+    """
+    Checks which queries knowledge base entails with one solver. Every
+    model found rules out the queries false in it, and the search stops
+    once no model falsifies any of the remaining queries.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    literals = [cnf.literal(query) for query in queries]
+    solver = Solver(cnf.clauses)
+    solver.reserve(len(cnf.names) - 1)
+    entailed = [True] * len(queries)
+    unresolved = list(range(len(queries)))
+    assumptions = []
+    while unresolved and solver.solve(assumptions):
+        model = solver.model
+        for i in unresolved:
+            if model[abs(literals[i])] != (literals[i] > 0):
+                entailed[i] = False
+        unresolved = [i for i in unresolved if entailed[i]]
+
+        # Look for a model where one of the remaining queries is false,
+        # guarded by a new variable assumed true for this search only
+        guard = solver.variables() + 1
+        solver.add_clause([-guard] + [-literals[i] for i in unresolved])
+        assumptions = [guard]
+    return entailed
+
+
+class KnowledgeBase():
+    """
+    Knowledge base that keeps one SAT solver alive between queries.
+
+    Sentences added outside any push() become permanent clauses.
+    Sentences added after a push() are only assumed, until the matching
+    pop() drops them. Learned clauses stay valid either way, so queries
+    after small changes reuse the work of earlier ones.
+    """
+
+    def __init__(self, *sentences):
+        self.cnf = CNF()
+        self.solver = Solver()
+        self.added = 0
+        self.frames = [[]]
+        for sentence in sentences:
+            self.add(sentence)
+
+    def sync(self):
+        """Passes clauses the CNF gained since the last call to the solver."""
+        for clause in self.cnf.clauses[self.added:]:
+            self.solver.add_clause(clause)
+        self.added = len(self.cnf.clauses)
+        self.solver.reserve(len(self.cnf.names) - 1)
+
+    def add(self, sentence):
+        """Adds a sentence to the innermost frame of the knowledge base."""
+        Sentence.validate(sentence)
+        if len(self.frames) == 1:
+            self.cnf.add(sentence)
+            self.frames[-1].append((sentence, None))
+        else:
+            self.frames[-1].append((sentence, self.cnf.literal(sentence)))
+        self.sync()
+
+    def push(self):
+        """Opens a frame of sentences that a later pop() removes."""
+        self.frames.append([])
+
+    def pop(self):
+        """Removes every sentence added since the matching push()."""
+        if len(self.frames) == 1:
+            raise Exception("no frame to pop")
+        self.frames.pop()
+
+    def assumptions(self):
+        """Returns the literals of all sentences added inside frames."""
+        return [
+            literal
+            for frame in self.frames[1:]
+            for sentence, literal in frame
+        ]
+
+    def knowledge(self):
+        """Returns the conjunction of every sentence currently known."""
+        return And(*[
+            sentence for frame in self.frames for sentence, _ in frame
+        ])
+
+    def satisfiable(self):
+        """Checks if the sentences currently known can all be true."""
+        return self.solver.solve(self.assumptions())
+
+    def entails(self, query):
+        """Checks if the sentences currently known entail query."""
+        literal = self.cnf.literal(query)
+        self.sync()
+        return not self.solver.solve(self.assumptions() + [-literal])
+
+
+def propagate(clauses, literals=()):
+    """
+    Makes every literal in `literals` true, then every literal left
+    alone in a clause, until none is. The clauses of each literal are
+    found through an index of occurrences, so every clause is visited
+    once per literal it contains rather than once per unit.
+    Returns the clauses that remain, without their false literals, and
+    the number of variables made true or false, or None if a clause can
+    no longer be satisfied.
+    """
+    clauses = list(clauses)
+    occurrences = dict()
+    for i, clause in enumerate(clauses):
+        if not clause:
+            return None
+        for literal in clause:
+            if literal in occurrences:
+                occurrences[literal].append(i)
+            else:
+                occurrences[literal] = [i]
+    sizes = [len(clause) for clause in clauses]
+    satisfied = [False] * len(clauses)
+    true = set()
+    queue = list(literals)
+    queue.extend(next(iter(clause)) for clause in clauses if len(clause) == 1)
+    while queue:
+        literal = queue.pop()
+        if literal in true:
+            continue
+        if -literal in true:
+            return None
+        true.add(literal)
+        for i in occurrences.get(literal, ()):
+            satisfied[i] = True
+        for i in occurrences.get(-literal, ()):
+            if not satisfied[i]:
+                sizes[i] -= 1
+                if sizes[i] == 0:
+                    return None
+                if sizes[i] == 1:
+                    queue.extend(other for other in clauses[i]
+                                 if -other not in true)
+
+    remaining = []
+    for i, clause in enumerate(clauses):
+        if not satisfied[i]:
+            if sizes[i] < len(clause):
+                clause = frozenset(
+                    literal for literal in clause if -literal not in true
+                )
+            remaining.append(clause)
+    return remaining, len(true)
+
+
+def components(clauses):
+    """
+    Splits clauses into groups that share no variables. Returns a list
+    of pairs of the frozenset of a group's clauses and a dictionary from
+    each of its variables to the number of its clauses.
+    """
+    index = dict()
+    for clause in clauses:
+        for literal in clause:
+            var = abs(literal)
+            if var in index:
+                index[var].append(clause)
+            else:
+                index[var] = [clause]
+
+    groups = []
+    visited = set()
+    for start in index:
+        if start in visited:
+            continue
+        visited.add(start)
+        group = set()
+        occurrences = dict()
+        stack = [start]
+        while stack:
+            var = stack.pop()
+            occurrences[var] = len(index[var])
+            for clause in index[var]:
+                if clause not in group:
+                    group.add(clause)
+                    for literal in clause:
+                        var = abs(literal)
+                        if var not in visited:
+                            visited.add(var)
+                            stack.append(var)
+        groups.append((frozenset(group), occurrences))
+    return groups
+
+
+@functools.lru_cache(maxsize=None)
+def block_patterns(count):
+    """
+    Returns symbol_patterns(count) as a tuple of patterns and the mask
+    of all models, computed once for every count.
+    """
+    patterns, full = symbol_patterns(count)
+    return tuple(patterns), full
+
+
+def count_block(clauses, variables):
+    """
+    Returns the number of assignments to `variables`, at most
+    BLOCK_SYMBOLS of them, that satisfy every clause, evaluating the
+    clauses over all of them at once as bit-packed models.
+    """
+    patterns, full = block_patterns(len(variables))
+    values = dict(zip(variables, patterns))
+    models = full
+    for clause in clauses:
+        satisfied = 0
+        for literal in clause:
+            if literal > 0:
+                satisfied |= values[literal]
+            else:
+                satisfied |= full ^ values[-literal]
+        models &= satisfied
+        if not models:
+            return 0
+    return bin(models).count("1")
+
+
+def count_clauses(clauses, variables, cache):
+    """
+    Returns the number of assignments to `variables` that satisfy every
+    clause, where each clause is a frozenset of literals over them.
+    Independent components are counted separately, and their counts
+    are cached by their clauses.
+    """
+
+    # Count branches from a stack of generators, each waiting for the
+    # count of the branch it yielded, so long chains of branches do not
+    # recurse
+    stack = [count_branch(clauses, len(variables), (), cache)]
+    count = None
+    while stack:
+        try:
+            branch = stack[-1].send(count)
+        except StopIteration as stop:
+            stack.pop()
+            count = stop.value
+        else:
+            stack.append(count_branch(*branch, cache))
+            count = None
+    return count
+
+
+def count_branch(clauses, size, literals, cache):
+    """
+    Counts the assignments to `size` variables that satisfy `clauses`
+    with every literal in `literals` true, for count_clauses. Yields
+    the clauses, size and literals of every branch it needs counted,
+    is sent back their counts, and returns its own.
+    """
+    result = propagate(clauses, literals)
+    if result is None:
+        return 0
+    clauses, fixed = result
+
+    groups = components(clauses)
+    count = 2 ** (size - fixed - sum(len(group[1]) for group in groups))
+    for component, occurrences in groups:
+        if component not in cache:
+
+            # Count small components over all their models at once, and
+            # otherwise branch on a variable in the most clauses: the
+            # middle one in numbering order, since variables numbered
+            # close together tend to share clauses, so branching there
+            # tends to split the component in halves
+            if len(occurrences) <= BLOCK_SYMBOLS:
+                total = count_block(component, sorted(occurrences))
+            else:
+                most = max(occurrences.values())
+                candidates = sorted(
+                    var for var, n in occurrences.items() if n == most
+                )
+                var = candidates[len(candidates) // 2]
+                total = 0
+                for literal in (var, -var):
+                    total += yield component, len(occurrences), (literal,)
+            cache[component] = total
+        count *= cache[component]
+        if count == 0:
+            break
+    return count
+
+
+def count_models(knowledge, symbols=None):
+    """
+    Returns the number of models of the knowledge base over `symbols`,
+    which defaults to the symbols of the knowledge base.
+    """
+    symbols = knowledge.symbols() if symbols is None else frozenset(symbols)
+    if not knowledge.symbols() <= symbols:
+        raise ValueError("symbols must include every symbol of knowledge")
+
+    # Every extra variable of the encoding is fixed by the symbols,
+    # so the encoding has exactly as many models as the knowledge base
+    cnf = CNF()
+    cnf.add(knowledge)
+    clauses = []
+    for clause in cnf.clauses:
+        clause = frozenset(clause)
+        if not any(-literal in clause for literal in clause):
+            clauses.append(clause)
+    variables = set(range(1, len(cnf.names)))
+    count = count_clauses(clauses, variables, dict())
+    return count * 2 ** len(symbols - knowledge.symbols())
+
+
+def iter_models(knowledge, symbols=None, packed=False):
+    """
+    Yields every model of the knowledge base over `symbols`, which
+    defaults to the symbols of the knowledge base, one at a time.
+    Models are dictionaries from symbol to value or, if `packed`,
+    integers where bit i is the value of the i-th symbol in sorted order.
+    """
+    symbols = sorted(knowledge.symbols() if symbols is None else symbols)
+    if not knowledge.symbols() <= set(symbols):
+        raise ValueError("symbols must include every symbol of knowledge")
+    cnf = CNF()
+    cnf.add(knowledge)
+    solver = Solver(cnf.clauses)
+    solver.reserve(len(cnf.names) - 1)
+    known = [(i, cnf.variables[symbol]) for i, symbol in enumerate(symbols)
+             if symbol in cnf.variables]
+    free = [i for i, symbol in enumerate(symbols) if symbol not in cnf.variables]
+
+    while solver.solve():
+        model = 0
+        for i, var in known:
+            if solver.model[var]:
+                model |= 1 << i
+
+        # Symbols outside the knowledge base take every combination
+        for values in range(1 << len(free)):
+            extended = model
+            for k, i in enumerate(free):
+                if values >> k & 1:
+                    extended |= 1 << i
+            if packed:
+                yield extended
+            else:
+                yield {symbol: bool(extended >> i & 1)
+                       for i, symbol in enumerate(symbols)}
+
+        # Rule out this assignment of the knowledge base's symbols
+        if not solver.add_clause([-var if solver.model[var] else var
+                                  for _, var in known]):
+            break
+
+
+# Entailment checkers selectable by name in model_check
+BACKENDS = {
+    "enumerate": enumerate_check,
+    "parallel": parallel_check,
+    "prune": prune_check,
+    "sat": sat_check,
+}
+
+# Checkers of many queries at once, for the backends that have one
+BACKENDS_MANY = {
+    "enumerate": enumerate_check_many,
+    "sat": sat_check_many,
+}
+
+# Backend used by model_check when none is given
+BACKEND = "enumerate"
+
+
+def model_check(knowledge, query, backend=None):
+    """
+    Checks if knowledge base entails query, using the named backend
+    from BACKENDS (BACKEND by default).
+    """
+    try:
+        check = BACKENDS[backend or BACKEND]
+    except KeyError:
+        raise ValueError(f"unknown model_check backend {backend}")
+    return check(knowledge, query)
+
+
+def model_check_many(knowledge, queries, backend=None):
+    """
+    Checks which of the queries knowledge base entails.
+    Returns a list of booleans in the same order as `queries`.
+    """
+    backend = backend or BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown model_check backend {backend}")
+    if backend in BACKENDS_MANY:
+        return BACKENDS_MANY[backend](knowledge, list(queries))
+    return [BACKENDS[backend](knowledge, query) for query in queries]
+
+
+# Spellings of each connective accepted by parse
+CONNECTIVES = {
+    "<=>": "<=>", "<->": "<=>", "=>": "=>", "->": "=>",
+    "¬": "¬", "~": "¬", "∧": "∧", "&": "∧", "∨": "∨", "|": "∨",
+    "(": "(", ")": ")",
+}
+CONNECTIVE_PATTERN = re.compile("(" + "|".join(
+    re.escape(spelling) for spelling in sorted(CONNECTIVES, key=len, reverse=True)
+) + ")")
+
+
+def tokenize(text):
+    """
+    Splits a formula into connectives, parentheses and symbol names.
+    Symbol names are the text between them, without surrounding spaces.
+    """
+    tokens = []
+    for i, piece in enumerate(CONNECTIVE_PATTERN.split(text)):
+
+        # Splitting on a capturing group alternates text and connectives
+        if i % 2:
+            tokens.append((CONNECTIVES[piece], piece))
+        elif piece.strip():
+            tokens.append(("symbol", piece.strip()))
+    return tokens
+
+
+# Binding strength of each connective, from loosest to tightest
+PRECEDENCE = {"<=>": 1, "=>": 2, "∨": 3, "∧": 4, "¬": 5}
+
+# Sentence built by each connective from its operands
+CONSTRUCTORS = {
+    "<=>": Biconditional, "=>": Implication, "∨": Or, "∧": And, "¬": Not,
+}
+
+
+def parse(text):
+    """
+    Parses a formula written like the output of Sentence.formula, in
+    one pass over the text. From loosest to tightest, the connectives
+    are <=>, => (grouping to the right), ∨, ∧ and ¬; ASCII spellings
+    <->, ->, |, & and ~ are accepted too. An empty formula is And().
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return And()
+
+    # Operator-precedence parsing, with the number of operands
+    # collected so far for each pending connective
+    operands = []
+    operators = []
+
+    def reduce():
+        connective, count = operators.pop()
+        arguments = operands[len(operands) - count:]
+        del operands[len(operands) - count:]
+        operands.append(CONSTRUCTORS[connective](*arguments))
+
+    expect_operand = True
+    for kind, spelling in tokens:
+        if expect_operand:
+            if kind == "symbol":
+                operands.append(Symbol(spelling))
+                expect_operand = False
+            elif kind in ("¬", "("):
+                operators.append([kind, 1])
+            else:
+                raise ValueError(f"unexpected {spelling}")
+        elif kind == ")":
+            while operators and operators[-1][0] != "(":
+                reduce()
+            if not operators:
+                raise ValueError("unbalanced )")
+            operators.pop()
+        elif kind in PRECEDENCE:
+            while operators and operators[-1][0] != "(" and (
+                PRECEDENCE[operators[-1][0]] > PRECEDENCE[kind]
+                or operators[-1][0] == kind == "<=>"
+            ):
+                reduce()
+
+            # Chains of ∧ or ∨ become one sentence with many operands
+            if operators and operators[-1][0] == kind and kind in ("∧", "∨"):
+                operators[-1][1] += 1
+            else:
+                operators.append([kind, 2])
+            expect_operand = True
+        else:
+            raise ValueError(f"unexpected {spelling}")
+
+    if expect_operand:
+        raise ValueError("unexpected end of formula")
+    while operators:
+        if operators[-1][0] == "(":
+            raise ValueError("unbalanced (")
+        reduce()
+    return operands[0]
+
+
+def to_dimacs(knowledge):
+    """
+    Returns the knowledge base as DIMACS CNF text. Each symbol's variable
+    is recorded in a comment line "c <variable> <symbol>"; the other
+    variables are introduced by the encoding.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    lines = [f"c {var} {name}" for var, name in enumerate(cnf.names)
+             if name is not None]
+    lines.append(f"p cnf {len(cnf.names) - 1} {len(cnf.clauses)}")
+    lines.extend(" ".join(str(literal) for literal in clause + [0])
+                 for clause in cnf.clauses)
+    return "\n".join(lines) + "\n"
+
+
+def from_dimacs(text):
+    """
+    Returns a knowledge base from DIMACS CNF text, as a conjunction of
+    disjunctions. Variables named by "c <variable> <symbol>" comments
+    become those symbols, and the others are named by their number.
+    """
+    names = dict()
+    literals = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("c"):
+            fields = line.split(maxsplit=2)
+            if len(fields) == 3 and fields[1].isdigit():
+                names[int(fields[1])] = fields[2]
+        elif line and not line.startswith(("p", "%")):
+            literals.extend(int(literal) for literal in line.split())
+
+    # Clauses end at each 0 and may span lines
+    clauses = []
+    clause = []
+    for literal in literals:
+        if literal == 0:
+            clauses.append(clause)
+            clause = []
+        else:
+            symbol = Symbol(names.get(abs(literal), str(abs(literal))))
+            clause.append(symbol if literal > 0 else Not(symbol))
+    if clause:
+        clauses.append(clause)
+    return And(*[Or(*clause) for clause in clauses])
+
+
+def load_knowledge(path):
+    """
+    Loads a knowledge base from a file: DIMACS CNF if the file name ends
+    in .cnf, otherwise one formula per line, skipping blank lines and
+    lines starting with #.
+    """
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".cnf"):
+        return from_dimacs(text)
+    return And(*[
+        parse(line) for line in text.splitlines()
+        if line.strip() and not line.lstrip().startswith("#")
+    ])
@@ -1,11 +1,38 @@
-import copy
-import itertools
+import math
 import random
+from collections import deque
+from collections.abc import MutableSet
+
+# Search steps make_random_move may spend enumerating mine
+# configurations, so guesses depend only on the board and not on how
+# fast the machine is
+GUESS_BUDGET = 100000
+
+# Largest frontier component whose configurations are enumerated
+MAX_ENUMERATED_CELLS = 200
+
+# Orders in which make_safe_move plays known safe cells: "fifo" plays
+# them as they were found, spreading out like a flood fill, and "lifo"
+# plays the newest first, following one region depth first
+SAFE_ORDERS = ("fifo", "lifo")
+
+
+def test_bit(data, index):
+    """
+    Returns bit `index` of bytes in little-endian order, as 0 or 1.
+    Looking bits up in bytes takes constant time, where shifting a large
+    integer copies all of it.
+    """
+    return data[index >> 3] >> (index & 7) & 1
 
 
 class Minesweeper():
     """
     Minesweeper game representation
+
+    Cells are stored as the bits of integers, row by row, with cell
+    (i, j) at bit i * (width + 1) + j. The spare bit at the end of each
+    row keeps shifted masks from wrapping into the next row.
     """
 
     def __init__(self, height=8, width=8, mines=8):
@@ -16,23 +43,47 @@ class Minesweeper():
         self.mines = set()
 
         # Initialize an empty field with no mines
-        self.board = []
+        self.stride = width + 1
+        self.cells = 0
         for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+            self.cells |= ((1 << width) - 1) << (i * self.stride)
 
         # Add mines randomly
         while len(self.mines) != mines:
             i = random.randrange(height)
             j = random.randrange(width)
-            if not self.board[i][j]:
+            if (i, j) not in self.mines:
                 self.mines.add((i, j))
-                self.board[i][j] = True
 
-        # At first, player has found no mines
+        # Set the bits in a byte array, rather than copying a growing
+        # integer once per mine
+        packed = bytearray((height * self.stride + 7) // 8)
+        for i, j in self.mines:
+            index = i * self.stride + j
+            packed[index // 8] |= 1 << (index % 8)
+        self.mine_bytes = bytes(packed)
+        self.mine_bits = int.from_bytes(packed, "little")
+
+        # Neighbor counts and the list board are computed when first needed
+        self.count_bits = None
+        self.count_bytes = None
+        self.rows = None
+
+        # At first, player has found no mines and revealed no cells
         self.mines_found = set()
+        self.revealed = set()
+
+    @property
+    def board(self):
+        """
+        Returns the board as a list of rows of booleans, True for mines.
+        """
+        if self.rows is None:
+            self.rows = [
+                [self.is_mine((i, j)) for j in range(self.width)]
+                for i in range(self.height)
+            ]
+        return self.rows
 
     def print(self):
         """
@@ -42,7 +93,7 @@ class Minesweeper():
         for i in range(self.height):
             print("--" * self.width + "-")
             for j in range(self.width):
-                if self.board[i][j]:
+                if self.is_mine((i, j)):
                     print("|X", end="")
                 else:
                     print("| ", end="")
@@ -51,7 +102,31 @@ class Minesweeper():
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return test_bit(self.mine_bytes, i * self.stride + j) == 1
+
+    def neighbor_counts(self):
+        """
+        Returns the number of nearby mines of every cell at once, as
+        four integers holding bit 0 to bit 3 of each cell's count.
+
+        Each of the eight shifts of the mine bits lines every cell up
+        with one of its neighbors, and the shifted masks are summed by
+        a ripple-carry adder working on all cells in parallel.
+        """
+        if self.count_bits is None:
+            planes = [0, 0, 0, 0]
+            for offset in (-self.stride - 1, -self.stride, -self.stride + 1, -1,
+                           1, self.stride - 1, self.stride, self.stride + 1):
+                if offset > 0:
+                    carry = (self.mine_bits >> offset) & self.cells
+                else:
+                    carry = (self.mine_bits << -offset) & self.cells
+                for k in range(4):
+                    planes[k], carry = planes[k] ^ carry, planes[k] & carry
+            self.count_bits = planes
+            size = len(self.mine_bytes)
+            self.count_bytes = [plane.to_bytes(size, "little") for plane in planes]
+        return self.count_bits
 
     def nearby_mines(self, cell):
         """
@@ -59,24 +134,47 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
+        i, j = cell
+        index = i * self.stride + j
+        self.neighbor_counts()
+        return sum(
+            test_bit(plane, index) << k
+            for k, plane in enumerate(self.count_bytes)
+        )
 
-        # Keep count of nearby mines
-        count = 0
+    def reveal(self, cell):
+        """
+        Reveals a safe cell. If it has no nearby mines, its neighbors
+        are revealed too, and so on across the whole region of cells
+        without nearby mines, in one flood fill.
 
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
+        Returns a list of (cell, nearby mines) pairs, one for every
+        newly revealed cell, or None if `cell` is a mine.
+        """
+        if self.is_mine(cell):
+            return None
+        if cell in self.revealed:
+            return []
 
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
+        observations = []
+        self.revealed.add(cell)
+        queue = deque([cell])
+        while queue:
+            current = queue.popleft()
+            count = self.nearby_mines(current)
+            observations.append((current, count))
+            if count != 0:
+                continue
 
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
+            # Neighbors of a cell without nearby mines are all safe
+            for i in range(current[0] - 1, current[0] + 2):
+                for j in range(current[1] - 1, current[1] + 2):
+                    if (0 <= i < self.height and 0 <= j < self.width
+                            and (i, j) not in self.revealed):
+                        self.revealed.add((i, j))
+                        queue.append((i, j))
 
-        return count
+        return observations
 
     def won(self):
         """
@@ -85,6 +183,149 @@ class Minesweeper():
         return self.mines_found == self.mines
 
 
+class CellSet(MutableSet):
+    """
+    Set of board cells stored as bits, with cell (i, j) at bit
+    i * width + j
+
+    Operations between two CellSets of the same width are bitwise
+    operations on integers. Single cells are looked up, added and
+    discarded in a byte array of the same bits instead, since changing
+    one bit of an integer copies all of it. Each form is made from the
+    other when first needed after a change.
+    """
+
+    def __init__(self, width, cells=(), bits=0):
+        self.width = width
+        self.bits = bits
+        for cell in cells:
+            self.add(cell)
+
+    @property
+    def bits(self):
+        """
+        Returns the cells as the bits of an integer.
+        """
+        if self._bits is None:
+            self._bits = int.from_bytes(self._packed, "little")
+        return self._bits
+
+    @bits.setter
+    def bits(self, bits):
+        self._bits = bits
+        self._packed = None
+
+    def packed(self):
+        """
+        Returns the cells as the bits of a byte array in little-endian
+        order, to be changed in place.
+        """
+        if self._packed is None:
+            self._packed = bytearray(
+                self._bits.to_bytes((self._bits.bit_length() + 7) // 8, "little")
+            )
+        return self._packed
+
+    def index(self, cell):
+        """
+        Returns the bit of a cell, or None if it is not on the board.
+        """
+        i, j = cell
+        if i < 0 or not 0 <= j < self.width:
+            return None
+        return i * self.width + j
+
+    def __contains__(self, cell):
+        index = self.index(cell)
+        if index is None:
+            return False
+        packed = self.packed()
+        return index >> 3 < len(packed) and test_bit(packed, index) == 1
+
+    def __iter__(self):
+
+        # Scan the binary digits from the lowest bit, in C rather than
+        # clearing one bit at a time from a large integer
+        digits = bin(self.bits)[:1:-1]
+        index = digits.find("1")
+        while index != -1:
+            yield divmod(index, self.width)
+            index = digits.find("1", index + 1)
+
+    def __len__(self):
+        return bin(self.bits).count("1")
+
+    def __repr__(self):
+        return f"CellSet({set(self)})"
+
+    def add(self, cell):
+        index = self.index(cell)
+        if index is None:
+            raise ValueError(f"cell {cell} is not on the board")
+        packed = self.packed()
+        if index >> 3 >= len(packed):
+            packed.extend(bytes((index >> 3) + 1 - len(packed)))
+        packed[index >> 3] |= 1 << (index & 7)
+        self._bits = None
+
+    def discard(self, cell):
+        index = self.index(cell)
+        if index is not None and index >> 3 < len(self.packed()):
+            self._packed[index >> 3] &= ~(1 << (index & 7))
+            self._bits = None
+
+    def copy(self):
+        return CellSet(self.width, bits=self.bits)
+
+    def _from_iterable(self, cells):
+        return CellSet(self.width, cells)
+
+    def compatible(self, other):
+        return isinstance(other, CellSet) and other.width == self.width
+
+    def __eq__(self, other):
+        if self.compatible(other):
+            return self.bits == other.bits
+        return super().__eq__(other)
+
+    def __le__(self, other):
+        if self.compatible(other):
+            return self.bits & ~other.bits == 0
+        return super().__le__(other)
+
+    def __or__(self, other):
+        if self.compatible(other):
+            return CellSet(self.width, bits=self.bits | other.bits)
+        return super().__or__(other)
+
+    def __and__(self, other):
+        if self.compatible(other):
+            return CellSet(self.width, bits=self.bits & other.bits)
+        return super().__and__(other)
+
+    def __sub__(self, other):
+        if self.compatible(other):
+            return CellSet(self.width, bits=self.bits & ~other.bits)
+        return super().__sub__(other)
+
+    def __xor__(self, other):
+        if self.compatible(other):
+            return CellSet(self.width, bits=self.bits ^ other.bits)
+        return super().__xor__(other)
+
+    def __ior__(self, other):
+        if self.compatible(other):
+            self.bits |= other.bits
+            return self
+        return super().__ior__(other)
+
+    def __isub__(self, other):
+        if self.compatible(other):
+            self.bits &= ~other.bits
+            return self
+        return super().__isub__(other)
+
+
 class Sentence():
     """
     Logical statement about a Minesweeper game
@@ -102,6 +343,13 @@ class Sentence():
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
+    def signature(self):
+        """
+        Returns a hashable summary of the sentence, equal for two
+        sentences exactly when the sentences are equal.
+        """
+        return frozenset(self.cells), self.count
+
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
@@ -136,99 +384,497 @@ class Sentence():
             self.cells.remove(cell)
 
 
+class KnowledgeBase():
+    """
+    Set of distinct sentences, indexed by the cells they mention
+    """
+
+    def __init__(self):
+
+        # Sentences by signature, so duplicates are found by hashing
+        self.sentences = dict()
+
+        # Signatures of the sentences mentioning each cell
+        self.index = dict()
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def __iter__(self):
+        return iter(list(self.sentences.values()))
+
+    def __contains__(self, sentence):
+        return sentence.signature() in self.sentences
+
+    def add(self, sentence):
+        """
+        Adds a sentence unless it has no cells or an equal sentence is
+        already known. Returns True if the sentence was added.
+        """
+        signature = sentence.signature()
+        if not sentence.cells or signature in self.sentences:
+            return False
+        self.sentences[signature] = sentence
+        for cell in sentence.cells:
+            self.index.setdefault(cell, set()).add(signature)
+        return True
+
+    def remove(self, sentence):
+        """
+        Removes a sentence, if an equal one is known.
+        """
+        signature = sentence.signature()
+        if self.sentences.pop(signature, None) is None:
+            return
+        for cell in signature[0]:
+            signatures = self.index[cell]
+            signatures.discard(signature)
+            if not signatures:
+                del self.index[cell]
+
+    def mentioning(self, cell):
+        """
+        Returns the list of sentences that mention a cell.
+        """
+        return [self.sentences[signature]
+                for signature in self.index.get(cell, ())]
+
+    def supersets(self, sentence):
+        """
+        Returns the other sentences whose cells include all of the
+        cells of `sentence`. Only the sentences sharing its least
+        mentioned cell are examined.
+        """
+        if not sentence.cells:
+            return []
+        cell = min(sentence.cells, key=lambda cell: len(self.index.get(cell, ())))
+        return [
+            other for other in self.mentioning(cell)
+            if other is not sentence and sentence.cells <= other.cells
+        ]
+
+    def subsets(self, sentence):
+        """
+        Returns the other sentences whose cells are all among the
+        cells of `sentence`.
+        """
+        signatures = set()
+        for cell in sentence.cells:
+            signatures.update(self.index.get(cell, ()))
+        return [
+            self.sentences[signature] for signature in signatures
+            if signature[0] < sentence.cells
+        ]
+
+    def holds(self, sentence):
+        """
+        Checks if this exact sentence object is still known, rather
+        than having been changed or dropped since it was queued.
+        """
+        return self.sentences.get(sentence.signature()) is sentence
+
+    def mark_mine(self, cell):
+        """
+        Updates every sentence mentioning a cell known to be a mine.
+        Returns the list of sentences that changed and are still known.
+        """
+        return self.update(cell, Sentence.mark_mine)
+
+    def mark_safe(self, cell):
+        """
+        Updates every sentence mentioning a cell known to be safe.
+        Returns the list of sentences that changed and are still known.
+        """
+        return self.update(cell, Sentence.mark_safe)
+
+    def update(self, cell, mark):
+        """
+        Applies `mark` to every sentence mentioning `cell`, re-indexing
+        them and dropping sentences that become empty or duplicates.
+        """
+        changed = []
+        for sentence in self.mentioning(cell):
+            self.remove(sentence)
+            mark(sentence, cell)
+            if self.add(sentence):
+                changed.append(sentence)
+        return changed
+
+
+def combine(a, b):
+    """
+    Returns the sum of two rows of a LinearSystem, or None if some
+    coefficient of the sum would fall outside -1 to 1.
+    """
+    a_pos, a_neg, a_count = a
+    b_pos, b_neg, b_count = b
+    if a_pos & b_pos or a_neg & b_neg:
+        return None
+    pos = (a_pos & ~b_neg) | (b_pos & ~a_neg)
+    neg = (a_neg & ~b_pos) | (b_neg & ~a_pos)
+    return pos, neg, a_count + b_count
+
+
+def negate(row):
+    """
+    Returns a row of a LinearSystem multiplied by -1.
+    """
+    pos, neg, count = row
+    return neg, pos, -count
+
+
+class LinearSystem():
+    """
+    Sentences as linear equations over cells that are 0 or 1 (mines),
+    kept in reduced row echelon form
+
+    Each row (pos, neg, count) says that the number of mines among the
+    cells in the bitset `pos`, minus the number among those in `neg`,
+    equals `count`. Rows are keyed by their pivot bit, which has
+    coefficient 1 in its own row and 0 in every other row.
+    Eliminations that would make a coefficient 2 or -2 are skipped, so
+    every row stays a pair of bitsets; rows remain sound either way.
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self.rows = dict()
+
+    def bit(self, cell):
+        """
+        Returns the bitset holding just `cell`.
+        """
+        i, j = cell
+        return 1 << (i * self.width + j)
+
+    def add(self, cells, count):
+        """
+        Adds the equation that `count` of `cells` are mines.
+        Returns a list of (cell, is_mine) pairs deduced from the rows
+        that changed.
+        """
+        pos = 0
+        for cell in cells:
+            pos |= self.bit(cell)
+        return self.insert((pos, 0, count))
+
+    def insert(self, row):
+        """
+        Reduces a row by the current pivots, stores it under a new pivot
+        and eliminates that pivot from the other rows.
+        Returns the deductions from the rows that changed.
+        """
+        pivots = 0
+        for pivot, other in self.rows.items():
+            pivots |= pivot
+            if pivot & row[0]:
+                reduced = combine(row, negate(other))
+            elif pivot & row[1]:
+                reduced = combine(row, other)
+            else:
+                continue
+            if reduced is not None:
+                row = reduced
+
+        # A row that settles its cells is not stored, since marking
+        # the cells will empty it anyway
+        deductions = self.deductions(row)
+        free = (row[0] | row[1]) & ~pivots
+        if deductions or not free:
+            return deductions
+
+        pivot = free & -free
+        if pivot & row[1]:
+            row = negate(row)
+        for other_pivot, other in self.rows.items():
+            if pivot & other[0]:
+                reduced = combine(other, negate(row))
+            elif pivot & other[1]:
+                reduced = combine(other, row)
+            else:
+                continue
+            if reduced is not None:
+                self.rows[other_pivot] = reduced
+                deductions.extend(self.deductions(reduced))
+        self.rows[pivot] = row
+        return deductions
+
+    def mark(self, cell, mine):
+        """
+        Substitutes the known value of a cell into every row.
+        Returns the deductions from the rows that changed.
+        """
+        bit = self.bit(cell)
+        deductions = []
+        pivot_row = None
+        for pivot, (pos, neg, count) in list(self.rows.items()):
+            if not (pos | neg) & bit:
+                continue
+            if mine:
+                count += -1 if pos & bit else 1
+            row = (pos & ~bit, neg & ~bit, count)
+            if pivot == bit:
+                del self.rows[pivot]
+                pivot_row = row
+            elif row[0] | row[1]:
+                self.rows[pivot] = row
+                deductions.extend(self.deductions(row))
+            else:
+                del self.rows[pivot]
+
+        # A row losing its pivot is inserted again under a new one
+        if pivot_row is not None:
+            deductions.extend(self.insert(pivot_row))
+        return deductions
+
+    def deductions(self, row):
+        """
+        Returns the (cell, is_mine) pairs a row settles on its own: the
+        count can only reach its largest value, the size of `pos`, with
+        every `pos` cell a mine and every `neg` cell safe, and its
+        smallest value the other way round.
+        """
+        pos, neg, count = row
+        if count == bin(pos).count("1"):
+            mines, safes = pos, neg
+        elif count == -bin(neg).count("1"):
+            mines, safes = neg, pos
+        else:
+            return []
+        return (
+            [(cell, True) for cell in CellSet(self.width, bits=mines)]
+            + [(cell, False) for cell in CellSet(self.width, bits=safes)]
+        )
+
+
+def count_configurations(sentences, budget):
+    """
+    Counts the assignments of mines to the cells of `sentences` that
+    satisfy every sentence, by backtracking over the cells.
+
+    Returns a dictionary from a number of mines k to the number of
+    consistent assignments with k mines, a dictionary from each cell
+    to how many of those assignments put a mine on it, by k, and the
+    number of search steps taken.
+    Raises TimeoutError if the search takes more than `budget` steps.
+    """
+
+    # Visit cells sentence by sentence, so constraints fail early
+    order = []
+    constraints = dict()
+    for i, sentence in enumerate(sentences):
+        for cell in sentence.cells:
+            if cell not in constraints:
+                constraints[cell] = []
+                order.append(cell)
+            constraints[cell].append(i)
+    need = [sentence.count for sentence in sentences]
+    left = [len(sentence.cells) for sentence in sentences]
+
+    counts = dict()
+    mines = {cell: dict() for cell in order}
+    placed = []
+    steps = 0
+
+    def search(i):
+        nonlocal steps
+        steps += 1
+        if steps > budget:
+            raise TimeoutError
+        if i == len(order):
+            k = len(placed)
+            counts[k] = counts.get(k, 0) + 1
+            for cell in placed:
+                mines[cell][k] = mines[cell].get(k, 0) + 1
+            return
+        cell = order[i]
+        for value in (0, 1):
+            consistent = True
+            for j in constraints[cell]:
+                need[j] -= value
+                left[j] -= 1
+                if not 0 <= need[j] <= left[j]:
+                    consistent = False
+            if consistent:
+                if value:
+                    placed.append(cell)
+                search(i + 1)
+                if value:
+                    placed.pop()
+            for j in constraints[cell]:
+                need[j] += value
+                left[j] += 1
+
+    search(0)
+    return counts, mines, steps
+
+
+def multiply(a, b):
+    """
+    Returns the product of two polynomials given as dictionaries from
+    exponents to coefficients.
+    """
+    product = dict()
+    for i, x in a.items():
+        for j, y in b.items():
+            product[i + j] = product.get(i + j, 0) + x * y
+    return product
+
+
+def choose(n, k):
+    """
+    Returns the number of ways to choose `k` of `n` cells.
+    """
+    if not 0 <= k <= n:
+        return 0
+    ways = 1
+    for i in range(min(k, n - k)):
+        ways = ways * (n - i) // (i + 1)
+    return ways
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, total_mines=None, order="fifo",
+                 guess_budget=GUESS_BUDGET):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Number of mines on the board, if the player is told
+        self.total_mines = total_mines
+
         # Keep track of which cells have been clicked on
-        self.moves_made = set()
+        self.moves_made = CellSet(width)
 
         # Keep track of cells known to be safe or mines
-        self.mines = set()
-        self.safes = set()
+        self.mines = CellSet(width)
+        self.safes = CellSet(width)
+
+        # Sentences as linear equations, reduced as they arrive
+        self.equations = LinearSystem(width)
+
+        # Known safe cells not played yet, in the order they are played
+        if order not in SAFE_ORDERS:
+            raise ValueError(f"unknown safe move order {order}")
+        self.order = order
+        self.pending = deque()
+
+        # Sentences about the game known to be true
+        self.knowledge = KnowledgeBase()
+
+        # Mine configurations counted per frontier component, by the
+        # signatures of the component's sentences
+        self.configurations = dict()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Search steps each guess may spend counting configurations
+        self.guess_budget = guess_budget
 
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
+        Returns the list of sentences that changed.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        changed = self.knowledge.mark_mine(cell)
+        return changed + self.deduce(self.equations.mark(cell, True))
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
+        Returns the list of sentences that changed.
         """
+        if cell not in self.safes and cell not in self.moves_made:
+            self.pending.append(cell)
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        changed = self.knowledge.mark_safe(cell)
+        return changed + self.deduce(self.equations.mark(cell, False))
+
+    def deduce(self, deductions):
+        """
+        Adds the (cell, is_mine) pairs deduced by the linear equations
+        to the knowledge base as one-cell sentences, so propagation
+        marks them. Returns the list of sentences added.
+        """
+        added = []
+        for cell, mine in deductions:
+            if cell in self.mines or cell in self.safes:
+                continue
+            sentence = Sentence({cell}, 1 if mine else 0)
+            if self.knowledge.add(sentence):
+                added.append(sentence)
+        return added
 
     def infer(self):
-        # 4 Mark any additional cells as mine or safe
-        new_safes = set()
+        """
+        Propagates every sentence in the knowledge base to a fixpoint.
+        Returns the set of newly known mines if there are any, else the
+        set of newly known safes, or None if nothing new was learned.
+        """
+        new_mines, new_safes = self.propagate(self.knowledge)
+        if len(new_mines) != 0:
+            return new_mines
+        elif len(new_safes) != 0:
+            return new_safes
+        else:
+            return None
+
+    def propagate(self, sentences):
+        """
+        Draws every conclusion that follows from the given sentences
+        together with the rest of the knowledge base.
+
+        Sentences are taken from a worklist. Sentences whose cells are
+        all mines or all safe mark those cells, and the sentences the
+        marks change go back on the worklist. Otherwise the sentence is
+        compared with the sentences that contain it or that it contains,
+        and the differences are added to the knowledge base and the
+        worklist. Each pair of sentences is only looked at again after
+        one of them changes.
+
+        Returns the sets of mines and safes that became known.
+        """
         new_mines = set()
-        for sentence in self.knowledge:
+        new_safes = set()
+        queue = deque(sentences)
+        while queue:
+            sentence = queue.popleft()
+            if not self.knowledge.holds(sentence):
+                continue
 
-            known_mines = copy.deepcopy(sentence.known_mines())
-            known_safes = copy.deepcopy(sentence.known_safes())
-            # add cells to self.mines or self.safes
-            # remove the cells from all sentences in KB and correct the count if mine
+            # 4 Mark any additional cells as mine or safe
+            known_mines = sentence.known_mines()
+            known_safes = sentence.known_safes()
             if known_mines is not None:
-                for mine in known_mines:
-                    self.mark_mine(mine)
+                for mine in list(known_mines):
+                    queue.extend(self.mark_mine(mine))
                     new_mines.add(mine)
-
+                continue
             if known_safes is not None:
-                for safe in known_safes:
-                    self.mark_safe(safe)
+                for safe in list(known_safes):
+                    queue.extend(self.mark_safe(safe))
                     new_safes.add(safe)
+                continue
 
-            if len(sentence.cells) == 0:
-                if sentence in self.knowledge:
-                    self.knowledge.remove(sentence)
-
-        # 5 If, based on any of the sentences in self.knowledge, new sentences can be inferred (using the subset
-        # method described in the Background), then those sentences should be added to the knowledge base as well.
-        for sub_sentence, sentence in itertools.permutations(self.knowledge, 2):
-
-            # if the sentence is a subset, create a new sentence
-            if sub_sentence.cells.issubset(sentence.cells) and sub_sentence.count != 0 \
-                    and len(sub_sentence.cells) != 0:
-
-                # if a sentence was duplicated during the previous step - remove the duplicate
-                if len(sub_sentence.cells) == len(sentence.cells) and sub_sentence.count == sentence.count:
-                    self.knowledge.remove(sub_sentence)
-
-                else:
-                    # new_cells are equal to the longer sentence
-                    new_cells = copy.deepcopy(sentence.cells)
-                    new_count = sentence.count - sub_sentence.count
-                    # remove each cell from the shorter sentence to generate brand new sentence
-                    for cell in sub_sentence.cells:
-                        new_cells.remove(cell)
-                    # add the new sentence to the KB
-                    one_more_sentence = Sentence(new_cells, new_count)
-                    if one_more_sentence not in self.knowledge:
-                        self.knowledge.append(one_more_sentence)
+            # 5 Infer new sentences with the subset method, in both directions
+            for superset in self.knowledge.supersets(sentence):
+                inferred = Sentence(superset.cells - sentence.cells,
+                                    superset.count - sentence.count)
+                if self.knowledge.add(inferred):
+                    queue.append(inferred)
+            for subset in self.knowledge.subsets(sentence):
+                inferred = Sentence(sentence.cells - subset.cells,
+                                    sentence.count - subset.count)
+                if self.knowledge.add(inferred):
+                    queue.append(inferred)
 
-        if len(new_mines) != 0:
-            return new_mines
-        elif len(new_safes) != 0:
-            return new_safes
-        else:
-            return None
+        return new_mines, new_safes
 
     def add_knowledge(self, cell, count):
         """
@@ -245,12 +891,32 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
+        self.propagate(self.observe(cell, count))
+
+    def add_knowledge_batch(self, observations):
+        """
+        Adds many (cell, count) observations at once, such as all the
+        cells of one flood-filled reveal, then runs inference once for
+        everything they changed.
+        """
+        changed = []
+        for cell, count in observations:
+            changed.extend(self.observe(cell, count))
+        self.propagate(changed)
+
+    def observe(self, cell, count):
+        """
+        Records that `cell` was played and has `count` nearby mines,
+        without inferring anything from it yet.
+        Returns the list of sentences that changed or were added, for
+        propagate to draw conclusions from.
+        """
 
         # 1)
         self.moves_made.add(cell)
 
         # 2)
-        self.mark_safe(cell)
+        changed = self.mark_safe(cell)
 
         # 3) take the cell height, width and create a sentence with all neighbouring cells
         # (which state is still undetermined) = count
@@ -292,14 +958,11 @@ class MinesweeperAI():
 
         # add sentence to the knowledge base
         new_sentence = Sentence(temp_sentence, temp_count)
-        if new_sentence not in self.knowledge:
-            self.knowledge.append(new_sentence)
+        if self.knowledge.add(new_sentence):
+            changed.append(new_sentence)
+            changed.extend(self.deduce(self.equations.add(temp_sentence, temp_count)))
 
-        # infer new safes, new mines and new sentences as long as new knowledge can be generated
-        while True:
-            p = self.infer()
-            if p is None:
-                break
+        return changed
 
     def make_safe_move(self):
         """
@@ -311,10 +974,14 @@ class MinesweeperAI():
         and self.moves_made, but should not modify any of those values.
         """
 
-        for cell in self.safes:
-            if cell in self.moves_made:
-                continue
+        # Cells can be played by other means after being queued, so
+        # those are dropped as they come up
+        while self.pending:
+            if self.order == "fifo":
+                cell = self.pending.popleft()
             else:
+                cell = self.pending.pop()
+            if cell not in self.moves_made:
                 self.moves_made.add(cell)
                 return cell
         return None
@@ -322,26 +989,159 @@ class MinesweeperAI():
     def make_random_move(self):
         """
         Returns a move to make on the Minesweeper board.
-        Should choose randomly among cells that:
+        Should choose among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+
+        Picks a cell least likely to be a mine, at random among equally
+        likely cells, using the probabilities from mine_probabilities.
         """
-        free_cells = []
-        for i in range(self.width):
-            for j in range(self.height):
-                cell = (i, j)
-                free_cells.append(cell)
+        probabilities, other = self.mine_probabilities()
+        others = (self.height * self.width - len(self.moves_made)
+                  - len(self.mines) - len(self.safes - self.moves_made)
+                  - len(probabilities))
+        risk = min(probabilities.values(), default=1)
+        if others > 0 and other <= risk:
+            return self.random_other_cell(probabilities)
+        if not probabilities:
+            return None
+        return random.choice(sorted(
+            cell for cell, probability in probabilities.items()
+            if math.isclose(probability, risk)
+        ))
 
-        for each in copy.deepcopy(self.mines):
-            if each in free_cells:
-                free_cells.remove(each)
-        for each in copy.deepcopy(self.moves_made):
-            if each in free_cells:
-                free_cells.remove(each)
+    def random_other_cell(self, frontier):
+        """
+        Returns a random cell that is not chosen, known or in `frontier`.
+        Draws cells at random first, so there is no scan of the whole
+        board unless nearly every cell is excluded.
+        """
+        excluded = (self.moves_made, self.mines, self.safes, frontier)
+        for _ in range(64):
+            cell = (random.randrange(self.height), random.randrange(self.width))
+            if not any(cell in cells for cells in excluded):
+                return cell
+        return random.choice([
+            (i, j)
+            for i in range(self.height)
+            for j in range(self.width)
+            if not any((i, j) in cells for cells in excluded)
+        ])
 
-        if len(free_cells) == 0:
-            return None
-        else:
-            random_int = random.randint(0, len(free_cells) - 1)
-            random_move = free_cells[random_int]
-            return random_move
+    def frontier_components(self):
+        """
+        Returns the sentences of the knowledge base grouped into
+        components that share no cells, as lists of sentences.
+        """
+        components = []
+        seen = set()
+        for sentence in self.knowledge:
+            signature = sentence.signature()
+            if signature in seen:
+                continue
+            seen.add(signature)
+            component = []
+            queue = deque([sentence])
+            while queue:
+                current = queue.popleft()
+                component.append(current)
+                for cell in current.cells:
+                    for other in self.knowledge.mentioning(cell):
+                        if other.signature() not in seen:
+                            seen.add(other.signature())
+                            queue.append(other)
+            components.append(component)
+        return components
+
+    def mine_probabilities(self):
+        """
+        Returns the probability that each frontier cell (a cell in some
+        sentence) is a mine, and the probability for any other unknown
+        cell, assuming every consistent placement of mines is equally
+        likely.
+
+        Each component of the frontier is enumerated separately, and
+        its counts are reused while the component stays unchanged.
+        Components that are too large or take the enumeration past
+        `guess_budget` search steps fall back to the largest count / cells ratio of their sentences.
+        If total_mines is known, components are combined with the
+        number of ways to place the remaining mines on the other cells.
+        """
+        budget = self.guess_budget
+        probabilities = dict()
+        enumerated = []
+        configurations = dict()
+        for component in self.frontier_components():
+            key = frozenset(sentence.signature() for sentence in component)
+            result = self.configurations.get(key)
+            if result is None:
+                cells = set().union(*[sentence.cells for sentence in component])
+                try:
+                    if len(cells) > MAX_ENUMERATED_CELLS:
+                        raise TimeoutError
+                    counts, mines, steps = count_configurations(
+                        component, budget
+                    )
+                    budget -= steps
+                    result = counts, mines
+                except TimeoutError:
+                    budget = 0
+                    for sentence in component:
+                        for cell in sentence.cells:
+                            probabilities[cell] = max(
+                                probabilities.get(cell, 0),
+                                sentence.count / len(sentence.cells)
+                            )
+                    continue
+            configurations[key] = result
+            enumerated.append(result)
+        self.configurations = configurations
+
+        others = (self.height * self.width - len(self.moves_made)
+                  - len(self.mines) - len(self.safes - self.moves_made)
+                  - sum(len(mines) for _, mines in enumerated)
+                  - len(probabilities))
+        estimated = round(sum(probabilities.values()))
+
+        if self.total_mines is not None:
+            remaining = self.total_mines - len(self.mines) - estimated
+
+            def ways(k):
+                if 0 <= remaining - k <= others:
+                    return choose(others, remaining - k)
+                return 0
+
+            total = {0: 1}
+            for counts, _ in enumerated:
+                total = multiply(total, counts)
+            weight = sum(n * ways(k) for k, n in total.items())
+            if weight > 0:
+                for i, (counts, mines) in enumerate(enumerated):
+                    rest = {0: 1}
+                    for j, (other, _) in enumerate(enumerated):
+                        if j != i:
+                            rest = multiply(rest, other)
+                    for cell, by_mines in mines.items():
+                        probabilities[cell] = sum(
+                            n * m * ways(k + j)
+                            for k, n in by_mines.items()
+                            for j, m in rest.items()
+                        ) / weight
+                other = 1
+                if others > 0:
+                    other = sum(
+                        n * ways(k) * (remaining - k)
+                        for k, n in total.items()
+                    ) / weight / others
+                return probabilities, other
+
+        # Without a mine total, components are independent and other
+        # cells are assumed as dense as the frontier
+        for counts, mines in enumerated:
+            solutions = sum(counts.values())
+            for cell, by_mines in mines.items():
+                probabilities[cell] = sum(by_mines.values()) / solutions
+        other = 1
+        if probabilities:
+            other = sum(probabilities.values()) / len(probabilities)
+        return probabilities, other
@@ -39,7 +39,7 @@ mine = pygame.transform.scale(mine, (cell_size, cell_size))
 
 # Create game and AI agent
 game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+ai = MinesweeperAI(height=HEIGHT, width=WIDTH, total_mines=MINES)
 
 # Keep track of revealed cells, flagged cells, and if a mine was hit
 revealed = set()
@@ -195,7 +195,7 @@ while True:
         # Reset game state
         elif resetButton.collidepoint(mouse):
             game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-            ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+            ai = MinesweeperAI(height=HEIGHT, width=WIDTH, total_mines=MINES)
             revealed = set()
             flags = set()
             lost = False
@@ -215,8 +215,8 @@ while True:
         if game.is_mine(move):
             lost = True
         else:
-            nearby = game.nearby_mines(move)
-            revealed.add(move)
-            ai.add_knowledge(move, nearby)
+            observations = game.reveal(move)
+            revealed.update(cell for cell, _ in observations)
+            ai.add_knowledge_batch(observations)
 
     pygame.display.flip()
@@ -0,0 +1,131 @@
+import concurrent.futures
+import functools
+import os
+import random
+import sys
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+HEIGHT = 8
+WIDTH = 8
+MINES = 8
+
+
+def main():
+    if len(sys.argv) not in range(2, 8):
+        sys.exit("Usage: python simulate.py games [height] [width] [mines] "
+                 "[processes] [seed]")
+    try:
+        games = int(sys.argv[1])
+        height = int(sys.argv[2]) if len(sys.argv) > 2 else HEIGHT
+        width = int(sys.argv[3]) if len(sys.argv) > 3 else WIDTH
+        mines = int(sys.argv[4]) if len(sys.argv) > 4 else MINES
+        processes = int(sys.argv[5]) if len(sys.argv) > 5 else None
+        seed = int(sys.argv[6]) if len(sys.argv) > 6 else 0
+    except ValueError:
+        sys.exit("Usage: python simulate.py games [height] [width] [mines] "
+                 "[processes] [seed]")
+    if games < 1:
+        sys.exit("Number of games must be positive")
+    if not 0 <= mines < height * width:
+        sys.exit("Number of mines must be less than the number of cells")
+
+    start = time.perf_counter()
+    results = simulate(games, height, width, mines, processes, seed)
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(results)
+    print(f"Board: {height}x{width}, {mines} mines "
+          f"({mines / (height * width):.1%} density)")
+    print(f"Games: {games} in {elapsed:.2f}s ({games / elapsed:.1f} games/s)")
+    print(f"Win rate: {summary['win_rate']:.1%}")
+    print(f"Moves per game: {summary['moves']:.1f}")
+    print(f"Random guesses per game: {summary['guesses']:.2f}")
+    print(f"Inference time per move: {summary['inference'] * 1e6:.1f}us")
+
+
+def play(height, width, mines, seed):
+    """
+    Plays one game of Minesweeper with MinesweeperAI, without a display.
+    The board and every random move are drawn from `seed`.
+
+    Returns a tuple (won, moves, guesses, inference), where `guesses` is
+    the number of random moves and `inference` the total time in
+    seconds spent in `add_knowledge_batch`. A move reveals a whole
+    region at once when it has no nearby mines.
+    """
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = MinesweeperAI(height=height, width=width, total_mines=mines)
+
+    moves = 0
+    guesses = 0
+    inference = 0
+    unrevealed = height * width - mines
+    while unrevealed > 0:
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+            if move is None:
+                break
+            guesses += 1
+        moves += 1
+        observations = game.reveal(move)
+        if observations is None:
+            return False, moves, guesses, inference
+
+        start = time.perf_counter()
+        ai.add_knowledge_batch(observations)
+        inference += time.perf_counter() - start
+        unrevealed -= len(observations)
+
+    return unrevealed == 0, moves, guesses, inference
+
+
+def play_many(height, width, mines, seeds):
+    """Plays one game for each seed, returning the list of results."""
+    return [play(height, width, mines, seed) for seed in seeds]
+
+
+def simulate(games, height=HEIGHT, width=WIDTH, mines=MINES,
+             processes=None, seed=0):
+    """
+    Plays `games` games with seeds `seed`, `seed + 1`, and so on,
+    spread over a pool of `processes` worker processes (one per CPU by
+    default, or none at all if `processes` is 1).
+    Returns the list of results of `play`, in seed order.
+    """
+    seeds = range(seed, seed + games)
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        return play_many(height, width, mines, seeds)
+
+    # Send seeds in chunks rather than paying for one task per game
+    size = max(1, games // (processes * 4))
+    chunks = [seeds[i:i + size] for i in range(0, games, size)]
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        play_chunk = functools.partial(play_many, height, width, mines)
+        for chunk in executor.map(play_chunk, chunks):
+            results.extend(chunk)
+    return results
+
+
+def summarize(results):
+    """
+    Returns the win rate, the average moves and random guesses per game
+    and the average inference time per move, in seconds.
+    """
+    games = len(results)
+    moves = sum(result[1] for result in results)
+    return {
+        "win_rate": sum(result[0] for result in results) / games,
+        "moves": moves / games,
+        "guesses": sum(result[2] for result in results) / games,
+        "inference": sum(result[3] for result in results) / max(moves, 1),
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pagerank
+from generate import generate_corpus, write_corpus
+
+SIZES = [10, 100, 1000, 10000, 100000, 1000000]
+
+# Largest corpus each engine is run on; beyond it a single run takes hours
+LIMITS = {
+    "crawl": 1000000,
+    "sample": 1000000,
+    "iterate": 10000,
+}
+
+
+def main():
+    if len(sys.argv) == 1:
+        sizes = SIZES
+    else:
+        try:
+            sizes = [int(size) for size in sys.argv[1:]]
+        except ValueError:
+            sys.exit("Usage: python benchmark.py [size ...]")
+
+    print(f"{'pages':>8} {'engine':>8} {'time (s)':>10} "
+          f"{'peak (KiB)':>11} {'iterations':>10} {'max error':>10}")
+    for n in sizes:
+        for engine, elapsed, peak, iterations, error in benchmark(n):
+            if peak is not None:
+                peak /= 1024
+            print(f"{n:>8} {engine:>8} {column(elapsed, '.4f', 10)} "
+                  f"{column(peak, '.1f', 11)} {column(iterations, 'd', 10)} "
+                  f"{column(error, '.4f', 10)}")
+
+
+def column(value, spec, width):
+    """Formats a table cell, showing a dash for missing values."""
+    if value is None:
+        return f"{'-':>{width}}"
+    return f"{value:>{width}{spec}}"
+
+
+def measure(function, *args):
+    """
+    Calls `function` twice: once to time it and once under tracemalloc.
+    Returns the result of the timed call, the wall time in seconds
+    and the peak traced memory in bytes.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def iterate_counting(corpus, damping_factor):
+    """
+    Runs `iterate_pagerank` and returns its ranks together with the number
+    of sweeps over the corpus it needed to converge.
+    """
+    stats = dict()
+    ranks = pagerank.iterate_pagerank(corpus, damping_factor, stats)
+    return ranks, stats["iterations"]
+
+
+def benchmark(n, seed=0):
+    """
+    Generates a corpus of `n` pages and runs every engine on it.
+    Returns a list of (engine, time, peak memory, iterations, error) rows,
+    where error is the largest absolute difference between the sampled
+    and the iterated PageRank of any page.
+    Engines above their size limit are reported with a time of None.
+    """
+    rows = []
+    corpus = generate_corpus(n, seed=seed)
+
+    if n <= LIMITS["crawl"]:
+        with tempfile.TemporaryDirectory() as directory:
+            write_corpus(corpus, directory)
+            corpus, elapsed, peak = measure(pagerank.crawl, directory)
+        rows.append(("crawl", elapsed, peak, None, None))
+    else:
+        rows.append(("crawl", None, None, None, None))
+
+    sampled = None
+    if n <= LIMITS["sample"]:
+        sampled, elapsed, peak = measure(
+            pagerank.sample_pagerank, corpus, pagerank.DAMPING, pagerank.SAMPLES
+        )
+        rows.append(("sample", elapsed, peak, pagerank.SAMPLES, None))
+    else:
+        rows.append(("sample", None, None, None, None))
+
+    if n <= LIMITS["iterate"]:
+        (iterated, iterations), elapsed, peak = measure(
+            iterate_counting, corpus, pagerank.DAMPING
+        )
+        error = None
+        if sampled is not None:
+            error = max(abs(sampled[page] - iterated[page]) for page in corpus)
+        rows.append(("iterate", elapsed, peak, iterations, error))
+    else:
+        rows.append(("iterate", None, None, None, None))
+
+    return rows
+
+
+if __name__ == "__main__":
+    main()
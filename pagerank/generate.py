@@ -0,0 +1,112 @@
+import itertools
+import os
+import random
+import sys
+
+# Exponent of the power law used for both out-degrees and page popularity
+EXPONENT = 2.1
+
+# Average number of links on a page that is not dangling
+MEAN_LINKS = 8
+
+
+def main():
+    if len(sys.argv) not in range(3, 7):
+        sys.exit("Usage: python generate.py directory pages "
+                 "[dangling_ratio] [self_link_ratio] [seed]")
+    directory = sys.argv[1]
+    n = int(sys.argv[2])
+    dangling = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+    self_links = float(sys.argv[4]) if len(sys.argv) > 4 else 0.0
+    seed = int(sys.argv[5]) if len(sys.argv) > 5 else None
+
+    corpus = generate_corpus(n, dangling, self_links, seed=seed)
+    write_corpus(corpus, directory)
+    links = sum(len(corpus[page]) for page in corpus)
+    print(f"Wrote {n} pages with {links} links to {directory}")
+
+
+def page_name(i):
+    """Returns the file name of the `i`-th generated page."""
+    return f"{i}.html"
+
+
+def generate_corpus(n, dangling=0.1, self_links=0.0,
+                    exponent=EXPONENT, mean_links=MEAN_LINKS, seed=None):
+    """
+    Return a synthetic corpus of `n` pages in the same format as `crawl`:
+    a dictionary mapping each page to the set of pages it links to.
+
+    Out-degrees follow a power law with the given `exponent`, and link
+    targets are drawn with probability proportional to a power law over
+    page popularity, so a few pages collect most of the links.
+    A `dangling` fraction of pages has no links at all, and each linking
+    page also links to itself with probability `self_links` (`crawl`
+    discards self-links, so they only exist in the written HTML).
+    """
+    if n < 1:
+        raise ValueError("corpus must contain at least one page")
+    rng = random.Random(seed)
+    pages = [page_name(i) for i in range(n)]
+
+    # Cumulative popularity weights, so each target draw is O(log n)
+    popularity = [1 / (rank + 1) ** (exponent - 1) for rank in range(n)]
+    rng.shuffle(popularity)
+    cum_weights = list(itertools.accumulate(popularity))
+
+    # Scale of the Pareto distribution so the mean out-degree is `mean_links`
+    alpha = exponent - 1
+    scale = mean_links * (alpha - 1) / alpha if alpha > 1 else 1
+
+    corpus = dict()
+    for i, page in enumerate(pages):
+        links = set()
+        if n > 1 and rng.random() >= dangling:
+
+            # Draw targets with replacement; repeats and self-draws are
+            # dropped, so popular pages are not redrawn forever
+            degree = min(n - 1, max(1, int(scale * rng.paretovariate(alpha))))
+            targets = rng.choices(range(n), cum_weights=cum_weights, k=degree)
+            links = set(pages[target] for target in targets if target != i)
+            if not links:
+                links.add(pages[(i + 1) % n])
+            if rng.random() < self_links:
+                links.add(page)
+        corpus[page] = links
+
+    return corpus
+
+
+def write_corpus(corpus, directory):
+    """
+    Write each page of `corpus` as an HTML file in `directory`,
+    in the same layout as the bundled corpus directories.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for page, links in corpus.items():
+        title = page[:-len(".html")]
+        items = "\n".join(
+            f"            <li><a href=\"{link}\">{link[:-len('.html')]}</a></li>"
+            for link in sorted(links)
+        )
+        with open(os.path.join(directory, page), "w") as f:
+            f.write(
+                "<!DOCTYPE html>\n"
+                "<html lang=\"en\">\n"
+                "    <head>\n"
+                f"        <title>{title}</title>\n"
+                "    </head>\n"
+                "    <body>\n"
+                f"        <h1>{title}</h1>\n"
+                "\n"
+                "        <div>Links:</div>\n"
+                "        <ul>\n"
+                f"{items}\n"
+                "        </ul>\n"
+                "    </body>\n"
+                "</html>\n"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import csv
+import math
+import sys
+
+from pagerank import crawl, DAMPING
+
+# Stop iterating once no score changes by more than this
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 1000
+
+FORMATS = (".csv", ".parquet")
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python linkanalysis.py corpus [engine ...] "
+                 "[output.csv | output.parquet]")
+    output = None
+    names = []
+    for argument in sys.argv[2:]:
+        if argument.endswith(FORMATS):
+            output = argument
+        elif argument in ENGINES:
+            names.append(argument)
+        else:
+            sys.exit(f"Unknown engine {argument}, "
+                     f"choose from: {', '.join(ENGINES)}")
+
+    graph = Graph(crawl(sys.argv[1]))
+    columns = analyze(graph, names or list(ENGINES))
+    if output is None:
+        write_csv(columns, sys.stdout)
+    else:
+        write_columns(columns, output)
+
+
+class Graph():
+    """
+    Sparse link graph of a corpus, compiled once and shared by all engines.
+
+    Pages are numbered in sorted order, and links are stored as lists
+    of page numbers in both directions.
+    """
+
+    def __init__(self, corpus):
+        self.pages = sorted(corpus)
+        self.index = {page: i for i, page in enumerate(self.pages)}
+        self.outlinks = [
+            [self.index[link] for link in sorted(corpus[page])]
+            for page in self.pages
+        ]
+        self.inlinks = [[] for page in self.pages]
+        for i, links in enumerate(self.outlinks):
+            for j in links:
+                self.inlinks[j].append(i)
+        self.dangling = [i for i, links in enumerate(self.outlinks) if not links]
+
+    def __len__(self):
+        return len(self.pages)
+
+
+def pagerank_scores(graph, damping_factor=DAMPING):
+    """
+    Returns PageRank values, computed by power iteration over the
+    incoming links of each page. Pages without links are treated as
+    linking to every page, like in `iterate_pagerank`.
+    """
+    n = len(graph)
+    outdegree = [len(links) for links in graph.outlinks]
+    ranks = [1 / n] * n
+    for _ in range(MAX_ITERATIONS):
+        shares = [
+            rank / degree if degree else 0
+            for rank, degree in zip(ranks, outdegree)
+        ]
+        dangling = sum(ranks[i] for i in graph.dangling) / n
+        base = (1 - damping_factor) / n + damping_factor * dangling
+        new_ranks = [
+            base + damping_factor * sum(shares[j] for j in links)
+            for links in graph.inlinks
+        ]
+        change = max(abs(new - old) for new, old in zip(new_ranks, ranks))
+        ranks = new_ranks
+        if change < TOLERANCE:
+            break
+    return {"pagerank": ranks}
+
+
+def hits_scores(graph):
+    """
+    Returns HITS hub and authority scores. A page's authority is the
+    sum of the hub scores of the pages linking to it, and its hub score
+    is the sum of the authorities it links to; both are normalized to
+    sum to 1 after every step.
+    """
+    n = len(graph)
+    hubs = [1 / n] * n
+    authorities = [1 / n] * n
+    for _ in range(MAX_ITERATIONS):
+        new_authorities = normalize(
+            [sum(hubs[j] for j in links) for links in graph.inlinks]
+        )
+        new_hubs = normalize(
+            [sum(new_authorities[j] for j in links) for links in graph.outlinks]
+        )
+        change = max(
+            max(abs(new - old) for new, old in zip(new_hubs, hubs)),
+            max(abs(new - old) for new, old in zip(new_authorities, authorities))
+        )
+        hubs, authorities = new_hubs, new_authorities
+        if change < TOLERANCE:
+            break
+    return {"hub": hubs, "authority": authorities}
+
+
+def indegree_scores(graph):
+    """Returns the number of pages linking to each page."""
+    return {"indegree": [len(links) for links in graph.inlinks]}
+
+
+def outdegree_scores(graph):
+    """Returns the number of pages each page links to."""
+    return {"outdegree": [len(links) for links in graph.outlinks]}
+
+
+def normalize(scores):
+    """Scales scores to sum to 1, leaving all-zero scores unchanged."""
+    total = math.fsum(scores)
+    if total == 0:
+        return scores
+    return [score / total for score in scores]
+
+
+# Maps engine names to functions from a Graph to named score columns
+ENGINES = {
+    "pagerank": pagerank_scores,
+    "hits": hits_scores,
+    "indegree": indegree_scores,
+    "outdegree": outdegree_scores,
+}
+
+
+def analyze(graph, names):
+    """
+    Runs each named engine on `graph`.
+    Returns a dictionary of equally long columns, starting with the
+    page names and followed by every score column of every engine.
+    """
+    columns = {"page": graph.pages}
+    for name in names:
+        columns.update(ENGINES[name](graph))
+    return columns
+
+
+def write_csv(columns, f):
+    """Writes columns to an open file as CSV with a header row."""
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    writer.writerows(zip(*columns.values()))
+
+
+def write_columns(columns, path):
+    """
+    Writes columns to `path` as CSV, or as Parquet if the path ends
+    in .parquet (requires pyarrow).
+    """
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            sys.exit("Writing Parquet output requires pyarrow")
+        pyarrow.parquet.write_table(pyarrow.table(columns), path)
+    else:
+        with open(path, "w", newline="") as f:
+            write_csv(columns, f)
+
+
+if __name__ == "__main__":
+    main()
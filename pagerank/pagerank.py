@@ -3,6 +3,8 @@ import random
 import re
 import sys
 
+from collections.abc import Mapping
+
 DAMPING = 0.85
 SAMPLES = 10000
 
@@ -57,39 +59,113 @@ def crawl(directory):
     return pages
 
 
-def transition_model(corpus, page, damping_factor):
+class PageDistribution(Mapping):
     """
-    Return a probability distribution over which page to visit next,
-    given a current page.
+    Probability distribution over the next page to visit from one page.
 
-    With probability `damping_factor`, choose a link at random
-    linked to by `page`. With probability `1 - damping_factor`, choose
-    a link at random chosen from all pages in the corpus.
+    Behaves like the dictionary `transition_model` used to build,
+    but only stores the page's own links: every page shares the
+    teleport probability of its TransitionModel.
     """
 
-    countLinkedPages = len(corpus[page])
-    countCorpusPages = len(corpus.keys())
+    def __init__(self, model, links):
+        self.model = model
+        self.links = links
+        self.targets = tuple(links)
+        if links:
+            self.link_probability = model.damping_factor / len(links)
+        else:
+            # A page with no links links to every page, itself included
+            self.link_probability = model.damping_factor / len(model.pages)
 
-    # Calculate each corpus page chance
-    noDamping = (1 - damping_factor) / countCorpusPages
+    def __getitem__(self, page):
+        if page not in self.model.corpus:
+            raise KeyError(page)
+        if not self.links or page in self.links:
+            return self.model.teleport + self.link_probability
+        return self.model.teleport
 
-    # Calculate each linked page chance
-    if countLinkedPages == 0:
-        damping = damping_factor / countCorpusPages
-    else:
-        damping = damping_factor / countLinkedPages
+    def __iter__(self):
+        return iter(self.model.pages)
 
-    withDamping = damping + noDamping
+    def __len__(self):
+        return len(self.model.pages)
+
+    def sample(self):
+        """Returns the next page of a random surfer on this page."""
+        if self.targets and random.random() < self.model.damping_factor:
+            return random.choice(self.targets)
+        return random.choice(self.model.pages)
 
-    result = {}
-    # Assign percentile chance for each page, based on linked/not-linked
-    for each in corpus.keys():
-        if each in corpus[page]:
-            result[each] = withDamping
-        else:
-            result[each] = noDamping
 
-    return result
+class TransitionModel():
+    """
+    Transition probabilities of a corpus for one damping factor.
+
+    The teleport probability `(1 - damping_factor) / N` is stored once,
+    and each page's distribution is built lazily from its links, so a
+    page costs O(out-degree) memory instead of a dictionary over all
+    N pages.
+
+    A model does not watch its corpus for changes: after adding,
+    removing or relinking pages of a corpus in place, call
+    `invalidate_transition_models(corpus)`.
+    """
+
+    def __init__(self, corpus, damping_factor):
+        self.corpus = corpus
+        self.damping_factor = damping_factor
+        self.pages = tuple(corpus)
+        self.teleport = (1 - damping_factor) / len(self.pages)
+        self.distributions = dict()
+
+    def __getitem__(self, page):
+        distribution = self.distributions.get(page)
+        if distribution is None:
+            distribution = PageDistribution(
+                self, frozenset(self.corpus[page])
+            )
+            self.distributions[page] = distribution
+        return distribution
+
+
+# Transition models of the most recently used corpus, by damping factor
+transition_models = dict()
+
+
+def get_transition_model(corpus, damping_factor):
+    """
+    Returns the TransitionModel for `corpus` and `damping_factor`,
+    reusing the cached one for the same corpus object.
+    """
+    model = transition_models.get(damping_factor)
+    if model is None or model.corpus is not corpus:
+        model = TransitionModel(corpus, damping_factor)
+        transition_models[damping_factor] = model
+    return model
+
+
+def invalidate_transition_models(corpus):
+    """
+    Drops the cached transition models of `corpus`, so the next ones are
+    built from its current pages and links. Call it after changing a
+    corpus in place.
+    """
+    for damping_factor, model in list(transition_models.items()):
+        if model.corpus is corpus:
+            del transition_models[damping_factor]
+
+
+def transition_model(corpus, page, damping_factor):
+    """
+    Return a probability distribution over which page to visit next,
+    given a current page.
+
+    With probability `damping_factor`, choose a link at random
+    linked to by `page`. With probability `1 - damping_factor`, choose
+    a link at random chosen from all pages in the corpus.
+    """
+    return get_transition_model(corpus, damping_factor)[page]
 
 
 def sample_pagerank(corpus, damping_factor, n):
@@ -112,13 +188,11 @@ def sample_pagerank(corpus, damping_factor, n):
     latest_page = initial_page
 
     # select N samples and keep track of each visited page
+    model = get_transition_model(corpus, damping_factor)
     for i in range(n):
-        possibilities = transition_model(corpus, latest_page, damping_factor)
-        keys = list(possibilities.keys())
-        values = list(possibilities.values())
-        next_page = random.choices(keys, weights=values, k=1)
-        track_record[next_page[0]] += 1
-        latest_page = next_page[0]
+        next_page = model[latest_page].sample()
+        track_record[next_page] += 1
+        latest_page = next_page
 
     # divide each result by the number of samples to make the total chance sum up to 1
     for record in track_record:
@@ -127,7 +201,7 @@ def sample_pagerank(corpus, damping_factor, n):
     return track_record
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, stats=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -135,6 +209,9 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    If a `stats` dictionary is given, the number of sweeps over the
+    corpus is stored in it under "iterations".
     """
 
     ranks = {}
@@ -144,10 +221,12 @@ def iterate_pagerank(corpus, damping_factor):
         ranks[each_page] = initial_rank
 
     enough = True
+    iterations = 0
 
     # update page rank until change is less than 0.001
     while enough:
         enough = False
+        iterations += 1
         # for each page in the corpus calculate a new page rank
         for page in corpus:
             page_rank = calc_page_rank(corpus, ranks, page)
@@ -155,6 +234,9 @@ def iterate_pagerank(corpus, damping_factor):
             if summ > abs(0.001):
                 enough = True
             ranks[page] = round(page_rank, 3)
+
+    if stats is not None:
+        stats["iterations"] = iterations
     return ranks
 
 
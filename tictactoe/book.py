@@ -0,0 +1,18 @@
+import sys
+
+import tictactoe as ttt
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python book.py [path]")
+    path = sys.argv[1] if len(sys.argv) == 2 else ttt.BOOK
+
+    table = ttt.solve_book()
+    ttt.write_book(table, path)
+    positions = sum(1 for entry in table if entry)
+    print(f"Solved {positions} positions, wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
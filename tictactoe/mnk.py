@@ -0,0 +1,382 @@
+"""
+m,n,k-game player: k in a row on an m by n board
+"""
+import math
+import sys
+import time
+
+from tictactoe import X, O, EMPTY, EXACT, LOWER, UPPER
+
+# Seconds the player may think about each move by default
+BUDGET = 1.0
+
+# Score of a win, less the number of moves it takes, so faster wins
+# score higher; heuristic scores stay far below it
+WIN = 10 ** 18
+
+# A line of k cells holding c stones of one player only scores
+# LINE_WEIGHT ** c for that player
+LINE_WEIGHT = 8
+
+# On boards with at most this many cells every empty cell is a
+# candidate move; on larger ones only cells near a stone are
+SMALL_BOARD = 25
+
+
+def main():
+    if len(sys.argv) not in range(4, 6):
+        sys.exit("Usage: python mnk.py m n k [seconds]")
+    try:
+        m, n, k = (int(argument) for argument in sys.argv[1:4])
+        budget = float(sys.argv[4]) if len(sys.argv) > 4 else BUDGET
+    except ValueError:
+        sys.exit("Usage: python mnk.py m n k [seconds]")
+
+    # Let the computer play both sides
+    game = MNKGame(m, n, k)
+    state = game.initial_state()
+    while not game.terminal(state):
+        start = time.perf_counter()
+        action = game.best_move(state, budget)
+        print(f"{game.player(state)} plays {action} "
+              f"(depth {game.depth}, {game.nodes} nodes, "
+              f"{time.perf_counter() - start:.2f}s)")
+        state = game.result(state, action)
+        game.print(state)
+    winner = game.winner(state)
+    print(f"Game Over: {winner} wins." if winner else "Game Over: Tie.")
+
+
+class Timeout(Exception):
+    """
+    Raised inside the search when the time budget runs out
+    """
+
+
+class MNKGame():
+    """
+    Game of k in a row on an m by n board
+
+    A state is a pair of bitmasks (x, o) of the cells taken by each
+    player, with cell (i, j) at bit i * (n + 1) + j. Bit n of every row
+    is never a cell, so a line shifted past the edge of the board lands
+    there and breaks instead of going on in the next row.
+    """
+
+    def __init__(self, m=3, n=3, k=3):
+        if not 1 <= k <= max(m, n):
+            raise ValueError("k must fit on the board")
+        self.m = m
+        self.n = n
+        self.k = k
+        self.stride = n + 1
+        self.full = 0
+        for i in range(m):
+            self.full |= ((1 << n) - 1) << (i * self.stride)
+
+        # Directions of lines: along a row, a column and both diagonals
+        self.directions = (1, self.stride, self.stride + 1, self.stride - 1)
+
+        # Every line of k cells on the board, for the heuristic evaluation
+        self.lines = []
+        for i in range(m):
+            for j in range(n):
+                for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    if (0 <= i + di * (k - 1) < m
+                            and 0 <= j + dj * (k - 1) < n):
+                        self.lines.append(sum(
+                            self.bit((i + di * step, j + dj * step))
+                            for step in range(k)
+                        ))
+
+        # Cells ordered from the center outwards, to break ties in ordering
+        center = ((m - 1) / 2, (n - 1) / 2)
+        self.centrality = {
+            self.bit((i, j)): -max(abs(i - center[0]), abs(j - center[1]))
+            for i in range(m)
+            for j in range(n)
+        }
+
+        # Search state: stored values by position, cutoffs by move,
+        # and statistics of the last best_move call
+        self.table = dict()
+        self.history = dict()
+        self.deadline = math.inf
+        self.nodes = 0
+        self.depth = 0
+
+    def bit(self, cell):
+        """
+        Returns the mask holding just `cell`.
+        """
+        i, j = cell
+        return 1 << (i * self.stride + j)
+
+    def cell(self, move):
+        """
+        Returns the cell (i, j) of a mask holding one cell.
+        """
+        return divmod(move.bit_length() - 1, self.stride)
+
+    def initial_state(self):
+        """
+        Returns starting state of the board.
+        """
+        return 0, 0
+
+    def from_board(self, board):
+        """
+        Returns the state of a list-of-lists board like tictactoe's.
+        """
+        x = 0
+        o = 0
+        for i, row in enumerate(board):
+            for j, cell in enumerate(row):
+                if cell == X:
+                    x |= self.bit((i, j))
+                elif cell == O:
+                    o |= self.bit((i, j))
+        return x, o
+
+    def to_board(self, state):
+        """
+        Returns a state as a list-of-lists board like tictactoe's.
+        """
+        x, o = state
+        return [
+            [X if x & self.bit((i, j)) else O if o & self.bit((i, j)) else EMPTY
+             for j in range(self.n)]
+            for i in range(self.m)
+        ]
+
+    def print(self, state):
+        """
+        Prints a text-based representation of the board.
+        """
+        for row in self.to_board(state):
+            print(" ".join(cell or "." for cell in row))
+
+    def player(self, state):
+        """
+        Returns player who has the next turn in a state.
+        """
+        x, o = state
+        return X if bin(x).count("1") == bin(o).count("1") else O
+
+    def actions(self, state):
+        """
+        Returns set of all possible actions (i, j) available in a state.
+        """
+        x, o = state
+        return set(self.cell(move) for move in self.moves(self.full & ~(x | o)))
+
+    def result(self, state, action):
+        """
+        Returns the state that results from making move (i, j).
+        """
+        x, o = state
+        move = self.bit(action)
+        if not move & self.full or (x | o) & move:
+            raise Exception("Invalid move")
+        if self.player(state) == X:
+            return x | move, o
+        return x, o | move
+
+    def winner(self, state):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        x, o = state
+        if self.wins(x):
+            return X
+        if self.wins(o):
+            return O
+        return None
+
+    def terminal(self, state):
+        """
+        Returns True if game is over, False otherwise.
+        """
+        x, o = state
+        return self.winner(state) is not None or x | o == self.full
+
+    def wins(self, mask):
+        """
+        Checks if a mask holds k cells in a row in any direction.
+        """
+        for direction in self.directions:
+            line = mask
+            for _ in range(self.k - 1):
+                line &= line >> direction
+            if line:
+                return True
+        return False
+
+    def moves(self, mask):
+        """
+        Returns the list of one-cell masks of the cells in `mask`.
+        """
+        digits = bin(mask)[:1:-1]
+        return [1 << index for index, digit in enumerate(digits) if digit == "1"]
+
+    def candidates(self, me, them):
+        """
+        Returns the mask of empty cells worth searching: all of them on
+        small boards, and otherwise those next to a stone, or the
+        center cell if the board is empty.
+        """
+        taken = me | them
+        empty = self.full & ~taken
+        if self.m * self.n <= SMALL_BOARD:
+            return empty
+        if not taken:
+            return self.bit(((self.m - 1) // 2, (self.n - 1) // 2))
+        near = taken
+        for direction in self.directions:
+            near |= taken << direction | taken >> direction
+        return near & empty
+
+    def ordered(self, me, them, first):
+        """
+        Returns the candidate moves, best first: the stored best move,
+        then moves that caused the most cutoffs, then central ones.
+        """
+        moves = sorted(
+            self.moves(self.candidates(me, them)),
+            key=lambda move: (self.history.get(move, 0), self.centrality[move]),
+            reverse=True
+        )
+        if first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def evaluate(self, me, them):
+        """
+        Returns a heuristic score for the player to move: every line of
+        k cells still open to only one player counts for that player,
+        more the more stones it already holds.
+        """
+        score = 0
+        for line in self.lines:
+            mine = line & me
+            theirs = line & them
+            if mine and not theirs:
+                score += LINE_WEIGHT ** bin(mine).count("1")
+            elif theirs and not mine:
+                score -= LINE_WEIGHT ** bin(theirs).count("1")
+        return score
+
+    def best_move(self, state, budget=BUDGET, max_depth=None):
+        """
+        Returns the best action (i, j) for the current player found
+        within `budget` seconds, by iterative deepening: searching one
+        move deeper each round and keeping the move of the last round
+        that finished.
+        """
+        if self.terminal(state):
+            return None
+        x, o = state
+        me, them = (x, o) if self.player(state) == X else (o, x)
+        empty = bin(self.full & ~(x | o)).count("1")
+        max_depth = min(max_depth or empty, empty)
+
+        self.deadline = time.perf_counter() + budget
+        self.nodes = 0
+        self.depth = 0
+        best = self.ordered(me, them, None)[0]
+        for depth in range(1, max_depth + 1):
+            try:
+                value = self.negamax(me, them, depth, -math.inf, math.inf, 0)
+            except Timeout:
+                break
+            best = self.table[(me, them)][3]
+            self.depth = depth
+
+            # Stop once the result is forced either way
+            if abs(value) >= WIN - empty:
+                break
+        return self.cell(best)
+
+    def negamax(self, me, them, depth, alpha, beta, ply):
+        """
+        Returns the value of a position for the player to move, `me`,
+        searching `depth` more moves with alpha-beta pruning. A player's
+        value is minus the opponent's, so one function searches both.
+        """
+        self.nodes += 1
+        if self.nodes % 1024 == 0 and time.perf_counter() > self.deadline:
+            raise Timeout
+
+        # Only the opponent, who just moved, can have won
+        if self.wins(them):
+            return -(WIN - ply)
+        if me | them == self.full:
+            return 0
+        if depth == 0:
+            return self.evaluate(me, them)
+
+        key = (me, them)
+        first = None
+        entry = self.table.get(key)
+        if entry is not None:
+            stored_depth, value, kind, first = entry
+            value = self.from_table(value, ply)
+            if stored_depth >= depth:
+                if kind == EXACT:
+                    return value
+                if kind == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if beta <= alpha:
+                    return value
+
+        v = -math.inf
+        window = alpha, beta
+        best = None
+        for move in self.ordered(me, them, first):
+            score = -self.negamax(them, me | move, depth - 1, -beta, -alpha, ply + 1)
+            if score > v:
+                v = score
+                best = move
+            alpha = max(alpha, v)
+            if beta <= alpha:
+                self.history[move] = self.history.get(move, 0) + depth * depth
+                break
+
+        if v <= window[0]:
+            kind = UPPER
+        elif v >= window[1]:
+            kind = LOWER
+        else:
+            kind = EXACT
+        self.table[key] = (depth, self.to_table(v, ply), kind, best)
+        return v
+
+    def to_table(self, value, ply):
+        """
+        Returns a value found `ply` moves below the root as it is stored:
+        a win score counts the moves from the stored position instead of
+        from the root, so it still holds when the position comes up again
+        at another ply or in a later search.
+        """
+        if value >= WIN - self.m * self.n:
+            return value + ply
+        if value <= -(WIN - self.m * self.n):
+            return value - ply
+        return value
+
+    def from_table(self, value, ply):
+        """
+        Returns a stored value as found `ply` moves below the root.
+        """
+        if value >= WIN - self.m * self.n:
+            return value - ply
+        if value <= -(WIN - self.m * self.n):
+            return value + ply
+        return value
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,71 @@
 """
 Tic Tac Toe Player
 """
-import copy
+import array
+import hashlib
 import math
+import os
+import sys
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Boards are searched as a pair of bitmasks, one per player, where
+# cell (i, j) is bit 3 * i + j
+FULL = 0b111111111
+
+# The 8 lines of three: rows, columns and diagonals
+WIN_MASKS = (
+    [0b111 << (3 * i) for i in range(3)]
+    + [0b1001001 << j for j in range(3)]
+    + [0b100010001, 0b001010100]
+)
+
+# Whether each of the 512 masks contains a whole line
+WINNING = [any(mask & line == line for line in WIN_MASKS) for mask in range(512)]
+
+# The 8 symmetries of the board, as the cell (i, j) that moves to each
+# cell in row-major order: rotations by 0, 90, 180 and 270 degrees,
+# each with and without a mirror
+SYMMETRIES = []
+for mirror in (False, True):
+    cells = [(i, 2 - j if mirror else j) for i in range(3) for j in range(3)]
+    for _ in range(4):
+        SYMMETRIES.append(cells)
+        cells = [(2 - j, i) for i, j in cells]
+
+# Each symmetry as a table from every mask to the mask it maps to
+PERMUTATIONS = [
+    [
+        sum(1 << k for k, (i, j) in enumerate(cells) if mask >> (3 * i + j) & 1)
+        for mask in range(512)
+    ]
+    for cells in SYMMETRIES
+]
+
+# Kinds of stored values: the exact value, or a bound on it found when
+# alpha-beta search cut off
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Values of positions already searched, by canonical board key
+transpositions = dict()
+
+# Each mask read as a ternary number with digit 1 for every set bit
+TERNARY = [sum(3 ** k for k in range(9) if mask >> k & 1) for mask in range(512)]
+
+# Solution table written by book.py: a header holding the SHA-256 hash
+# of this file, then one 16-bit entry per ternary board index with the
+# mask of best moves in the low 9 bits and the value plus 2 above them,
+# or 0 for boards that are not reachable, non-terminal positions
+BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+BOOK_MAGIC = b"TTTBOOK1"
+
+# Solution table in use, loaded by the first call to minimax
+book = None
+
 
 def initial_state():
     """
@@ -18,45 +76,46 @@ def initial_state():
             [EMPTY, EMPTY, EMPTY]]
 
 
+def encode(board):
+    """
+    Returns the masks of the cells taken by X and by O on a board.
+    """
+    x = 0
+    o = 0
+    for i, row in enumerate(board):
+        for j, cell in enumerate(row):
+            if cell == X:
+                x |= 1 << (3 * i + j)
+            elif cell == O:
+                o |= 1 << (3 * i + j)
+    return x, o
+
+
+def decode(x, o):
+    """
+    Returns the board with X on the cells of mask `x` and O on `o`.
+    """
+    return [
+        [X if x >> (3 * i + j) & 1 else O if o >> (3 * i + j) & 1 else EMPTY
+         for j in range(3)]
+        for i in range(3)
+    ]
+
+
 def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    Count_x = 0
-    Count_o = 0
-    # Count the total number of X and O
-    for row in board:
-        for cell in row:
-            if cell == "X":
-                Count_x += 1
-            elif cell == "O":
-                Count_o += 1
-
-    # Check who's turn it is
-    if len(actions(board)) == 9:
-        return "X"
-    elif Count_x == Count_o:
-        return "X"
-    else:
-        return "O"
+    return bits_player(*encode(board))
 
 
 def actions(board):
     """
     Returns set of all possible actions (i, j) available on the board.
     """
-    actions = set()
-
-    # Check the value of each cell if EMPTY and record the coordinates of the empty ones
-    for row_idx, row in enumerate(board):
-        for cell_idx, cell in enumerate(row):
-            if cell == EMPTY:
-                actions.add((row_idx, cell_idx))
-
-    return actions
-
-
-results_count = 0
+    x, o = encode(board)
+    free = FULL & ~(x | o)
+    return set(divmod(k, 3) for k in range(9) if free >> k & 1)
 
 
 def result(board, action):
@@ -75,7 +134,7 @@ def result(board, action):
         raise Exception("Invalid move")
 
     # Create a new board
-    board_new = copy.deepcopy(board)
+    board_new = [row.copy() for row in board]
 
     # Assign the player's symbol into the cell
     board_new[row][cell] = player(board)
@@ -87,29 +146,11 @@ def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    winner_col_1 = []
-    winner_col_2 = []
-    winner_col_3 = []
-    winner_diagonal_1 = []
-    winner_diagonal_2 = []
-    winner_accumulative = []
-
-    # Check if there is a winner by row
-    for idx, row in enumerate(board):
-        if row.count(row[0]) == len(row):
-            return row[0]
-        else:
-            winner_col_1.append(row[0])
-            winner_col_2.append(row[1])
-            winner_col_3.append(row[2])
-            winner_diagonal_1.append(row[idx])
-            winner_diagonal_2.append(row[2 - idx])
-    # Check if the winner is in any other direction
-    winner_accumulative.extend([winner_col_1, winner_col_2, winner_col_3, winner_diagonal_1, winner_diagonal_2])
-    for each in winner_accumulative:
-        if each.count(each[0]) == len(each):
-            return each[0]
-
+    x, o = encode(board)
+    if WINNING[x]:
+        return X
+    elif WINNING[o]:
+        return O
     return None
 
 
@@ -117,34 +158,71 @@ def terminal(board):
     """
     Returns True if game is over, False otherwise.
     """
-    if winner(board) is not None:
-        return True
-    elif len(actions(board)) == 0:
-        return True
-    else:
-        return False
+    return bits_score(*encode(board)) is not None
 
 
 def utility(board):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
+    return bits_score(*encode(board)) or 0
+
+
+def bits_player(x, o):
+    """
+    Returns player who has the next turn, given the masks of both players.
+    """
+    if bin(x).count("1") == bin(o).count("1"):
+        return X
+    return O
 
-    if winner(board) == "X":
+
+def bits_score(x, o):
+    """
+    Returns 1 if X has won, -1 if O has won, 0 for a full board with no
+    winner and None if the game is not over.
+    """
+    if WINNING[x]:
         return 1
-    elif winner(board) == "O":
+    if WINNING[o]:
         return -1
-    else:
+    if x | o == FULL:
         return 0
+    return None
+
+
+def bits_key(x, o):
+    """
+    Returns a key for the position, the same for all 8 of its symmetries:
+    the smallest of the symmetric positions' masks, packed into 18 bits.
+    """
+    return min(
+        permutation[x] << 9 | permutation[o]
+        for permutation in PERMUTATIONS
+    )
 
 
 def minimax(board):
     """
     Returns the optimal action for the current player on the board.
     """
-    if terminal(board):
+    x, o = encode(board)
+    if bits_score(x, o) is not None:
         return None
-    current_player = player(board)
+
+    # Reachable positions are answered from the solution table
+    entry = load_book()[bits_index(x, o)]
+    if entry:
+        moves = entry & FULL
+        return divmod((moves & -moves).bit_length() - 1, 3)
+    return best_move(x, o)
+
+
+def best_move(x, o):
+    """
+    Returns the optimal action for the current player, given the masks
+    of both players, by searching the game tree.
+    """
 
     # Check who's player turn it is
     # For every available action check what the opponent would do
@@ -153,46 +231,215 @@ def minimax(board):
 
     alpha = -math.inf
     beta = math.inf
+    free = FULL & ~(x | o)
+    moves = [1 << k for k in range(9) if free >> k & 1]
 
-    if current_player == "X":
+    if bits_player(x, o) == X:
         best_utility = -math.inf
-        for max_action in actions(board):
-            action_utility = min_value(result(board, max_action), alpha, beta)
+        for move in moves:
+            action_utility = min_bits(x | move, o, alpha, beta)
             if action_utility > best_utility:
-                best_max_action = max_action
+                best = move
                 best_utility = action_utility
             alpha = max(alpha, action_utility)
-        return best_max_action
     else:
         best_utility = math.inf
-        for min_action in actions(board):
-            action_utility = max_value(result(board, min_action), alpha, beta)
+        for move in moves:
+            action_utility = max_bits(x, o | move, alpha, beta)
             if action_utility < best_utility:
-                best_min_action = min_action
+                best = move
                 best_utility = action_utility
             beta = min(beta, action_utility)
-        return best_min_action
+    return divmod(best.bit_length() - 1, 3)
+
+
+def bits_index(x, o):
+    """
+    Returns the board as a ternary number, with digit 1 for X and 2
+    for O in place 3 * i + j.
+    """
+    return TERNARY[x] + 2 * TERNARY[o]
+
+
+def bits_value(x, o):
+    """
+    Returns the exact value of a position with best play from both sides.
+    """
+    if bits_player(x, o) == X:
+        return max_bits(x, o, -math.inf, math.inf)
+    return min_bits(x, o, -math.inf, math.inf)
+
+
+def rules_hash():
+    """
+    Returns the SHA-256 hash of this file, so a solution table made
+    under other rules is noticed.
+    """
+    with open(os.path.abspath(__file__), "rb") as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+def solve_book():
+    """
+    Solves every position reachable from the initial state.
+    Returns the solution table as an array of entries by board index.
+    """
+    table = array.array("H", [0]) * 3 ** 9
+    seen = set()
+    stack = [(0, 0)]
+    while stack:
+        x, o = stack.pop()
+        index = bits_index(x, o)
+        if index in seen or bits_score(x, o) is not None:
+            continue
+        seen.add(index)
+
+        value = bits_value(x, o)
+        moves = 0
+        free = FULL & ~(x | o)
+        while free:
+            move = free & -free
+            free ^= move
+            if bits_player(x, o) == X:
+                child = (x | move, o)
+            else:
+                child = (x, o | move)
+            if bits_value(*child) == value:
+                moves |= move
+            stack.append(child)
+        table[index] = (value + 2) << 9 | moves
+    return table
+
+
+def write_book(table, path=BOOK):
+    """
+    Writes a solution table to `path`, headed by the current rules hash.
+    """
+    if sys.byteorder == "big":
+        table = array.array("H", table)
+        table.byteswap()
+    with open(path, "wb") as f:
+        f.write(BOOK_MAGIC + rules_hash() + table.tobytes())
+
+
+def read_book(path=BOOK):
+    """
+    Returns the solution table stored at `path`, or None if there is
+    none, or it is damaged or was made from a different version of
+    this file.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    header = BOOK_MAGIC + rules_hash()
+    if not data.startswith(header) or len(data) != len(header) + 2 * 3 ** 9:
+        return None
+    table = array.array("H")
+    table.frombytes(data[len(header):])
+    if sys.byteorder == "big":
+        table.byteswap()
+    return table
+
+
+def load_book():
+    """
+    Returns the solution table, reading it on first use. A missing or
+    outdated table is solved again and saved, if the file is writable.
+    """
+    global book
+    if book is None:
+        book = read_book()
+        if book is None:
+            book = solve_book()
+            try:
+                write_book(book)
+            except OSError:
+                pass
+    return book
+
+
+def lookup(key, alpha, beta):
+    """
+    Returns the stored value of a position if it settles the search
+    within the window (alpha, beta), and the window narrowed by any
+    stored bound.
+    """
+    entry = transpositions.get(key)
+    if entry is not None:
+        value, kind = entry
+        if kind == EXACT:
+            return value, alpha, beta
+        if kind == LOWER:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if beta <= alpha:
+            return value, alpha, beta
+    return None, alpha, beta
+
+
+def store(key, v, alpha, beta):
+    """
+    Stores the value found by searching a position within the window
+    (alpha, beta), recording whether it is exact or only a bound.
+    """
+    if v <= alpha:
+        transpositions[key] = (v, UPPER)
+    elif v >= beta:
+        transpositions[key] = (v, LOWER)
+    else:
+        transpositions[key] = (v, EXACT)
 
 
 def max_value(board, alpha, beta):
-    if terminal(board):
-        return utility(board)
+    return max_bits(*encode(board), alpha, beta)
+
+
+def min_value(board, alpha, beta):
+    return min_bits(*encode(board), alpha, beta)
+
+
+def max_bits(x, o, alpha, beta):
+    score = bits_score(x, o)
+    if score is not None:
+        return score
+    key = bits_key(x, o)
+    value, alpha, beta = lookup(key, alpha, beta)
+    if value is not None:
+        return value
     v = -math.inf
-    for action in actions(board):
-        v = max(v, min_value(result(board, action), alpha, beta))
+    window = alpha, beta
+    free = FULL & ~(x | o)
+    while free:
+        move = free & -free
+        free ^= move
+        v = max(v, min_bits(x | move, o, alpha, beta))
         alpha = max(alpha, v)
         if beta <= alpha:
             break
+    store(key, v, *window)
     return v
 
 
-def min_value(board, alpha, beta):
-    if terminal(board):
-        return utility(board)
+def min_bits(x, o, alpha, beta):
+    score = bits_score(x, o)
+    if score is not None:
+        return score
+    key = bits_key(x, o)
+    value, alpha, beta = lookup(key, alpha, beta)
+    if value is not None:
+        return value
     v = math.inf
-    for action in actions(board):
-        v = min(v, max_value(result(board, action), alpha, beta))
+    window = alpha, beta
+    free = FULL & ~(x | o)
+    while free:
+        move = free & -free
+        free ^= move
+        v = min(v, max_bits(x, o | move, alpha, beta))
         beta = min(beta, v)
         if beta <= alpha:
             break
+    store(key, v, *window)
     return v